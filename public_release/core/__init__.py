@@ -7,6 +7,8 @@ This package contains the core implementation of:
 - PDS (Persona Drift Suppressor)  
 - PCR (Persona Case Repository)
 - L/M/S State Tracking
+- LLM response caching for deterministic calls
+- Fused single-call state/response/PCC chain
 
 For detailed algorithm specifications, see paper Sections 4.1-4.3.
 """
@@ -18,10 +20,15 @@ from .pcc_evaluator import PCCEvaluator
 from .pds_corrector import PDSCorrector
 from .pcr_manager import PCRManager
 from .state_tracker import StateTracker
+from .llm_cache import LLMCache, CachedLLMClient
+from .fused_chain import FusedChain
 
 __all__ = [
     "PCCEvaluator",
     "PDSCorrector",
     "PCRManager",
     "StateTracker",
+    "LLMCache",
+    "CachedLLMClient",
+    "FusedChain",
 ]
@@ -0,0 +1,266 @@
+"""
+Fused State -> Response -> PCC Chain
+
+Runs the per-event chain (S/M impact assessment, response generation,
+PCC self-evaluation) as one LLM call instead of three serial ones. The
+three steps share the same persona/state context, so a single prompt
+asks for one JSON object {"deltas", "response", "pcc"} and two provider
+round trips per event are saved.
+
+Note: PDS correction stays a separate call and is only needed on the
+low-PCC branch. The PCC verdict comes from the generating model itself
+(same rubric as PCCEvaluator, paper Appendix C); use the unfused chain
+when an independent evaluator model is required.
+"""
+
+import asyncio
+from typing import Awaitable, Dict, Tuple
+
+from utils.json_stream import JSONFieldStream
+from utils.prompt_builder import static_prefix
+from .pcc_evaluator import PCCEvaluator
+
+
+# JSON mode (not a strict schema): supported by every provider backend
+CHAIN_RESPONSE_FORMAT = {"type": "json_object"}
+
+# Token budget for deltas + response + L/S/M verdicts
+CHAIN_MAX_TOKENS = 1200
+
+# Impact assessment range per dimension (paper Section 4.1.2)
+MAX_DELTA = 2.0
+
+
+class FusedChain:
+    """
+    One-call state update, response generation and PCC scoring
+
+    step(event):
+    1. Prompt with L traits, the S/M state before the event and the event
+    2. Apply the returned deltas to the StateTracker
+    3. Aggregate the returned L/S/M verdicts with the PCC formula
+
+    Malformed output applies zero deltas and is scored like an
+    unparseable PCC verdict (0.5), so it goes through PDS correction.
+    """
+
+    def __init__(self, llm_client, state_tracker, pcc_evaluator: PCCEvaluator,
+                 model_name=None, temperature=0.7):
+        """
+        Initialize fused chain
+
+        Args:
+            llm_client: LLM client for the fused call
+            state_tracker: StateTracker of the persona (updated in place)
+            pcc_evaluator: Provides PCC aggregation of the L/S/M verdicts
+            model_name: Model for the fused call (None = client default)
+            temperature: Sampling temperature (response generation)
+        """
+        self.llm_client = llm_client
+        self.state = state_tracker
+        self.pcc = pcc_evaluator
+        self.model_name = model_name
+        self.temperature = temperature
+
+    def step(self, event: str) -> Tuple[str, float, Dict]:
+        """
+        Process one event with a single LLM call
+
+        Args:
+            event: Event description
+
+        Returns:
+            response: Generated response
+            pcc_score: PCC of the response (0-1)
+            details: Dimensional subscores {L, S, M}
+        """
+        result = self.llm_client.generate(
+            prompt=self.chain_prompt(event),
+            model=self.model_name,
+            temperature=self.temperature,
+            max_tokens=CHAIN_MAX_TOKENS,
+            response_format=CHAIN_RESPONSE_FORMAT,
+            system_prefix=self.chain_prefix()
+        )
+
+        return self._apply(result)
+
+    async def astep(self, event: str) -> Tuple[str, float, Dict]:
+        """
+        Coroutine version of step()
+
+        The state update runs synchronously once the call returns, so
+        concurrent callers cannot interleave it; events of one persona
+        must still be stepped in order.
+        """
+        result = await self.llm_client.agenerate(
+            prompt=self.chain_prompt(event),
+            model=self.model_name,
+            temperature=self.temperature,
+            max_tokens=CHAIN_MAX_TOKENS,
+            response_format=CHAIN_RESPONSE_FORMAT,
+            system_prefix=self.chain_prefix()
+        )
+
+        return self._apply(result)
+
+    async def astream_step(self, event: str) -> Tuple[Dict, Awaitable]:
+        """
+        Streaming version of astep() that returns once the state is updated
+
+        The completion is streamed (llm_client.astream) into a queue; a
+        consumer task parses it incrementally and applies the deltas as
+        soon as the "deltas" field closes, which is the first field of
+        the output. The caller can then start the next event's call
+        while this response and its PCC verdict are still streaming.
+
+        Returns:
+            current_state: S/M after this event's deltas
+            rest: Awaitable of (response, pcc_score, details)
+        """
+        loop = asyncio.get_running_loop()
+        state_ready = loop.create_future()
+        chunks = asyncio.Queue()
+
+        async def produce():
+            try:
+                async for chunk in self.llm_client.astream(
+                    prompt=self.chain_prompt(event),
+                    model=self.model_name,
+                    temperature=self.temperature,
+                    max_tokens=CHAIN_MAX_TOKENS,
+                    response_format=CHAIN_RESPONSE_FORMAT,
+                    system_prefix=self.chain_prefix()
+                ):
+                    await chunks.put(chunk)
+            finally:
+                await chunks.put(None)   # end of stream
+
+        async def consume():
+            producer = asyncio.create_task(produce())
+            try:
+                parser = JSONFieldStream()
+                text = []
+                while (chunk := await chunks.get()) is not None:
+                    text.append(chunk)
+                    for key, value in parser.feed(chunk):
+                        if key == "deltas" and not state_ready.done():
+                            self._update_state(value, state_ready)
+                await producer   # re-raise provider errors
+            except BaseException as e:
+                producer.cancel()
+                if not state_ready.done():
+                    state_ready.set_exception(e)
+                raise
+
+            result = "".join(text)
+            output = self._parse_output(result)
+            if not state_ready.done():
+                # No parseable deltas field in the stream
+                self._update_state(output and output.get("deltas"), state_ready)
+            return self._score(output, result)
+
+        rest = asyncio.create_task(consume())
+        try:
+            current_state = await state_ready
+        except BaseException:
+            await asyncio.gather(rest, return_exceptions=True)
+            raise
+        return current_state, rest
+
+    def chain_prefix(self) -> str:
+        """
+        Static part of the fused prompt: role, L traits, the three steps
+        and the output format
+
+        Combines the impact assessment (paper Appendix D), generation
+        (prompts/generation_template.txt) and PCC (paper Appendix C)
+        instructions. Depends only on the L-layer, so it is served from
+        the provider's prompt cache (see utils.prompt_builder).
+        """
+        return static_prefix(f"""
+        You are simulating a persona and evaluating your own response.
+
+        [L-layer Traits]
+        {self.pcc._format_traits(self.state.get_L_traits())}
+
+        Step 1 - Assess the event's psychological impact on:
+        - S (short-term emotion): -2.0 to +2.0
+        - M_meaning (purpose/value): -2.0 to +2.0
+        - M_strain (stress): -2.0 to +2.0
+
+        Step 2 - Respond as the persona in the state after applying
+        these deltas (values clipped to 0-10), preserving L-layer traits.
+
+        Step 3 - Evaluate the response across L/S/M dimensions with
+        evidence (see paper Appendix C for detailed rubric).
+
+        Output one JSON object:
+        {{"deltas": {{"S": ..., "M_meaning": ..., "M_strain": ...}},
+          "response": "...",
+          "pcc": {{"L": {{"score": ..., "evidence": "..."}},
+                  "S": {{"score": ..., "evidence": "..."}},
+                  "M": {{"score": ..., "evidence": "..."}}}}}}
+
+        [Full rubrics and examples in paper Appendices C and D]
+        """)
+
+    def chain_prompt(self, event: str) -> str:
+        """Per-call part of the fused prompt (S/M state before the event, event)"""
+        state = self.state.get_current_state()
+
+        return f"""
+        [Current State]
+        S={state['S']}, M_meaning={state['M_meaning']}, M_strain={state['M_strain']}
+        M description: {self.state.get_m_state_description()}
+
+        [Event]
+        {event}
+        """
+
+    def _apply(self, result: str) -> Tuple[str, float, Dict]:
+        """Apply the deltas of a fused output and score its response"""
+        output = self._parse_output(result)
+        self.state.apply_deltas(self._deltas(output and output.get("deltas")))
+        return self._score(output, result)
+
+    def _update_state(self, raw_deltas, state_ready):
+        """Apply streamed deltas and resolve the caller's state future"""
+        self.state.apply_deltas(self._deltas(raw_deltas))
+        state_ready.set_result(self.state.get_current_state())
+
+    @staticmethod
+    def _parse_output(result: str):
+        """Fused output as a dict with a string response, or None if malformed"""
+        output = PCCEvaluator._parse(result)
+        if (not isinstance(output, dict)
+                or not isinstance(output.get("response"), str)):
+            return None
+        return output
+
+    def _score(self, output, result: str) -> Tuple[str, float, Dict]:
+        """Response and PCC of a parsed fused output"""
+        if output is None:
+            # Keep the raw text as the response; the fallback PCC routes it to PDS
+            return result, 0.5, {"L": 0.5, "S": 0.5, "M": 0.5}
+
+        verdict = output.get("pcc")
+        if isinstance(verdict, dict):
+            pcc_score, details = self.pcc._aggregate(verdict)
+        else:
+            pcc_score, details = 0.5, {"L": 0.5, "S": 0.5, "M": 0.5}
+
+        return output["response"], pcc_score, details
+
+    @staticmethod
+    def _deltas(raw) -> Dict:
+        """S/M deltas clipped to the assessment range (0.0 if missing)"""
+        raw = raw if isinstance(raw, dict) else {}
+        deltas = {}
+        for key in ('S', 'M_meaning', 'M_strain'):
+            try:
+                value = float(raw.get(key, 0.0))
+            except (TypeError, ValueError):
+                value = 0.0
+            deltas[key] = max(-MAX_DELTA, min(MAX_DELTA, value))
+        return deltas
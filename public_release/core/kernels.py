@@ -0,0 +1,183 @@
+"""
+Numeric kernels for PCR retrieval
+
+Hot loops over all cases of a scene. Compiled with Numba when it is
+installed; otherwise equivalent NumPy implementations are used, so
+results are the same either way (up to float32 rounding). The fused
+pcr_topk kernel exists only with Numba (None otherwise); callers fall
+back to the separate NumPy passes. On a single thread the BLAS mat-vec
+of the NumPy path is faster, so pcr_topk only pays off when the row
+scan is split across several threads (see kernel_threads()).
+
+Retrieval also runs in executor threads (PDSCorrector.acorrect_if_needed),
+possibly several at once. Numba's workqueue layer aborts the process on
+concurrent parallel regions, and TBB launched from a non-main thread
+hangs interpreter exit, so only pcr_topk is parallel and its calls are
+serialized. The threading layer is left to Numba's configuration; set
+NUMBA_THREADING_LAYER=omp (or workqueue) where TBB is installed.
+"""
+
+import threading
+import numpy as np
+
+try:
+    import numba
+    from numba import njit, prange
+    HAVE_NUMBA = True
+except ImportError:  # Numba is optional
+    HAVE_NUMBA = False
+
+# One parallel region at a time; each already uses every kernel thread
+_PARALLEL_LOCK = threading.Lock()
+
+# Fill value for empty top-K slots (finite, so fastmath comparisons hold)
+_NO_SCORE = -3.0e38
+
+
+def kernel_threads():
+    """
+    Threads available to the parallel kernels (1 without Numba)
+
+    Read from the configuration: numba.get_num_threads() would launch
+    the threading layer on the calling (possibly executor) thread.
+    """
+    return numba.config.NUMBA_NUM_THREADS if HAVE_NUMBA else 1
+
+
+if HAVE_NUMBA:
+    @njit(fastmath=True, cache=True)
+    def state_proximity_batch(query_sm, case_sm, max_distance):
+        """
+        State proximity of every case to the query
+
+        Args:
+            query_sm: float32 [3] query (S, Mm, Ms)
+            case_sm: float32 [n, 3] case (S, Mm, Ms) rows
+            max_distance: L1 normalizer (30.0 for three 0-10 dimensions)
+
+        Returns:
+            float32 [n], 1 - L1(query, case) / max_distance
+        """
+        n = case_sm.shape[0]
+        out = np.empty(n, dtype=np.float32)
+        scale = np.float32(1.0 / max_distance)
+        for i in range(n):
+            distance = (abs(case_sm[i, 0] - query_sm[0]) +
+                        abs(case_sm[i, 1] - query_sm[1]) +
+                        abs(case_sm[i, 2] - query_sm[2]))
+            out[i] = 1.0 - distance * scale
+        return out
+
+    def pcr_topk(embeddings, case_sm, query, query_sm, lam, k, max_distance):
+        """
+        Fused PCR scoring and top-K selection in one pass over the cases
+
+        Each row of `embeddings` and `case_sm` is read exactly once: the
+        semantic dot product, state proximity and RankScore are computed
+        per row and pushed into a small per-chunk sorted top-K buffer.
+        The chunk buffers are merged at the end.
+
+        Args:
+            embeddings: float32 [n, d] unit-norm case embeddings
+            case_sm: float32 [n, 3] case (S, Mm, Ms) rows
+            query: float32 [d] unit-norm query embedding
+            query_sm: float32 [3] query (S, Mm, Ms)
+            lam: Semantic weight λ
+            k: Number of cases to return
+            max_distance: L1 normalizer for state proximity
+
+        Returns:
+            (rows, scores): int64 [min(k, n)] and float32 [min(k, n)],
+            best first; ties keep case order
+        """
+        n_chunks = max(1, min(embeddings.shape[0], 4 * kernel_threads()))
+        with _PARALLEL_LOCK:
+            return _pcr_topk_chunked(embeddings, case_sm, query, query_sm,
+                                     lam, k, max_distance, n_chunks)
+
+    @njit(parallel=True, fastmath=True, cache=True)
+    def _pcr_topk_chunked(embeddings, case_sm, query, query_sm, lam, k,
+                          max_distance, n_chunks):
+        """pcr_topk over n_chunks row ranges processed in parallel"""
+        n, d = embeddings.shape
+        k = min(k, n)
+        chunk = (n + n_chunks - 1) // n_chunks
+
+        top_rows = np.full((n_chunks, k), -1, dtype=np.int64)
+        top_scores = np.full((n_chunks, k), _NO_SCORE, dtype=np.float32)
+        scale = np.float32(1.0 / max_distance)
+        w_sem = np.float32(lam)
+        w_state = np.float32(1.0 - lam)
+
+        for c in prange(n_chunks):
+            for i in range(c * chunk, min(n, (c + 1) * chunk)):
+                sim = np.float32(0.0)
+                for j in range(d):
+                    sim += embeddings[i, j] * query[j]
+                distance = (abs(case_sm[i, 0] - query_sm[0]) +
+                            abs(case_sm[i, 1] - query_sm[1]) +
+                            abs(case_sm[i, 2] - query_sm[2]))
+                score = w_sem * sim + w_state * (1.0 - distance * scale)
+
+                # Insertion into the chunk's sorted buffer (k is tiny)
+                if score > top_scores[c, k - 1]:
+                    pos = k - 1
+                    while pos > 0 and score > top_scores[c, pos - 1]:
+                        top_scores[c, pos] = top_scores[c, pos - 1]
+                        top_rows[c, pos] = top_rows[c, pos - 1]
+                        pos -= 1
+                    top_scores[c, pos] = score
+                    top_rows[c, pos] = i
+
+        # Merge: chunks are in row order, so a stable sort keeps ties ordered
+        flat_rows = top_rows.ravel()
+        flat_scores = top_scores.ravel()
+        order = np.argsort(-flat_scores, kind='mergesort')
+        rows = np.empty(k, dtype=np.int64)
+        scores = np.empty(k, dtype=np.float32)
+        m = 0
+        for idx in order:
+            if m == k:
+                break
+            if flat_rows[idx] >= 0:
+                rows[m] = flat_rows[idx]
+                scores[m] = flat_scores[idx]
+                m += 1
+        return rows[:m], scores[:m]
+else:
+    pcr_topk = None
+
+    def state_proximity_batch(query_sm, case_sm, max_distance):
+        """
+        State proximity of every case to the query
+
+        Args:
+            query_sm: float32 [3] query (S, Mm, Ms)
+            case_sm: float32 [n, 3] case (S, Mm, Ms) rows
+            max_distance: L1 normalizer (30.0 for three 0-10 dimensions)
+
+        Returns:
+            float32 [n], 1 - L1(query, case) / max_distance
+        """
+        distance = np.abs(case_sm - query_sm).sum(axis=1)
+        return 1.0 - distance * np.float32(1.0 / max_distance)
+
+
+def top_k_indices(scores, k):
+    """
+    Indices of the k highest scores, best first
+
+    O(n) partition plus an O(k log k) sort of the winners, instead of
+    sorting all n scores. Partitioning at n - k selects the largest
+    values without allocating a negated copy of `scores`.
+    """
+    n = scores.shape[0]
+    k = min(k, n)
+    if k <= 0:
+        return np.empty(0, dtype=np.intp)
+    if k < n:
+        top = np.sort(np.argpartition(scores, n - k)[n - k:])
+    else:
+        top = np.arange(n)
+    # Ties keep case order, like a stable descending sort
+    return top[np.argsort(-scores[top], kind='stable')]
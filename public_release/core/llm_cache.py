@@ -0,0 +1,89 @@
+"""
+LLM Response Cache - Deterministic Call Reuse
+
+PCC scoring and S/M impact assessment run at low temperature and are
+re-issued verbatim across re-evaluations and ablations. Their
+completions are cached by content hash (utils.LLMCache, re-exported
+here) so repeated runs skip the API.
+
+Note: Only calls at or below `max_temperature` are cached; sampling
+calls (e.g. PDS rewrites at 0.7) always go to the provider.
+"""
+
+from typing import Optional
+
+from utils.llm_cache import LLMCache
+
+
+class CachedLLMClient:
+    """
+    Drop-in wrapper around an LLM client that consults an LLMCache
+
+    Exposes the same generate()/agenerate() interface, so PCCEvaluator,
+    PDSCorrector and StateTracker use it unchanged. Other attributes are
+    forwarded to the wrapped client.
+
+    A utils.LLMClient already has an exact-match tier: the cache replaces
+    it (one lookup, one key), and calls are forwarded as they are.
+    """
+
+    def __init__(self, llm_client, cache: LLMCache):
+        """
+        Args:
+            llm_client: Underlying client (e.g. utils.LLMClient)
+            cache: Completion cache
+        """
+        self.llm_client = llm_client
+        self.cache = cache
+        self._inner = hasattr(llm_client, 'exact_cache')
+        if self._inner:
+            llm_client.exact_cache = cache
+
+    def __getattr__(self, name):
+        return getattr(self.llm_client, name)
+
+    def generate(self, prompt: str, model: Optional[str] = None,
+                 temperature: float = 0.7, max_tokens: int = 500,
+                 **options) -> str:
+        """Generate via cache (get-before-call, set-after-call)"""
+        if self._inner or not self.cache.cacheable(temperature):
+            return self.llm_client.generate(
+                prompt, model=model, temperature=temperature,
+                max_tokens=max_tokens, **options
+            )
+
+        key = self._key(prompt, model, temperature, max_tokens, options)
+        result = self.cache.get(key)
+        if result is None:
+            result = self.llm_client.generate(
+                prompt, model=model, temperature=temperature,
+                max_tokens=max_tokens, **options
+            )
+            self.cache.set(key, result)
+        return result
+
+    async def agenerate(self, prompt: str, model: Optional[str] = None,
+                        temperature: float = 0.7, max_tokens: int = 500,
+                        **options) -> str:
+        """Coroutine version of generate()"""
+        if self._inner or not self.cache.cacheable(temperature):
+            return await self.llm_client.agenerate(
+                prompt, model=model, temperature=temperature,
+                max_tokens=max_tokens, **options
+            )
+
+        key = self._key(prompt, model, temperature, max_tokens, options)
+        result = self.cache.get(key)
+        if result is None:
+            result = await self.llm_client.agenerate(
+                prompt, model=model, temperature=temperature,
+                max_tokens=max_tokens, **options
+            )
+            self.cache.set(key, result)
+        return result
+
+    def _key(self, prompt, model, temperature, max_tokens, options):
+        """Cache key, resolving the default model of the wrapped client"""
+        model = model or getattr(self.llm_client, 'model', None)
+        return self.cache.make_key(model, prompt, temperature, max_tokens,
+                                   **options)
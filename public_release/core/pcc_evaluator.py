@@ -8,7 +8,95 @@ including exact evaluation rubrics and NLI guidance are provided in paper Append
 """
 
 import json
-from typing import Dict, Tuple
+import asyncio
+from typing import Dict, List, Tuple
+
+from utils.prompt_builder import static_prefix
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; stdlib json is the fallback
+    orjson = None
+
+
+def _dimension_schema():
+    """JSON schema of one dimension's verdict"""
+    return {
+        "type": "object",
+        "properties": {
+            "score": {"type": "number"},
+            "evidence": {"type": "string"}
+        },
+        "required": ["score", "evidence"],
+        "additionalProperties": False
+    }
+
+
+def _response_format(name, dimensions):
+    """Strict json_schema response format over the given dimensions"""
+    return {
+        "type": "json_schema",
+        "json_schema": {
+            "name": name,
+            "strict": True,
+            "schema": {
+                "type": "object",
+                "properties": {dim: _dimension_schema() for dim in dimensions},
+                "required": list(dimensions),
+                "additionalProperties": False
+            }
+        }
+    }
+
+
+# Structured output spec: constrains the evaluator to {"L", "S", "M"}
+# verdicts so parsing does not fall back on stray tokens
+PCC_RESPONSE_FORMAT = _response_format("pcc_evaluation", ("L", "S", "M"))
+
+# Split passes for L-gated evaluation (L first, S/M only if needed)
+PCC_L_RESPONSE_FORMAT = _response_format("pcc_l_evaluation", ("L",))
+PCC_SM_RESPONSE_FORMAT = _response_format("pcc_sm_evaluation", ("S", "M"))
+
+# Row-batched evaluation: one prompt scores several numbered responses
+PCC_ROWS_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "pcc_row_evaluation",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "rows": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "id": {"type": "integer"},
+                            "L": _dimension_schema(),
+                            "S": _dimension_schema(),
+                            "M": _dimension_schema()
+                        },
+                        "required": ["id", "L", "S", "M"],
+                        "additionalProperties": False
+                    }
+                }
+            },
+            "required": ["rows"],
+            "additionalProperties": False
+        }
+    }
+}
+
+# Token budget for one schema-constrained evaluation (per row when batched)
+PCC_MAX_TOKENS = 400
+
+# Rubric section of the static evaluator prefix
+# NOTE: Complete L/S/M rubric in paper Appendix C
+PCC_RUBRIC = "[Rubric]\nScore each dimension with evidence (see paper Appendix C)."
+
+# Bump when a rubric or prompt template changes; part of the key of
+# persisted completion caches (utils.SemanticCache cache_key)
+RUBRIC_VERSION = 1
 
 
 class PCCEvaluator:
@@ -21,9 +109,17 @@ class PCCEvaluator:
     - M-Coherence: Meaning/strain manifestation
     
     Final PCC = min(L_score, (S_score + M_score) / 2)
+    
+    With `l_gate` set, L is scored first in its own pass. If it falls
+    below the gate, PDS fires whatever S/M are (L < gate <= threshold),
+    so the S/M pass is skipped: S/M are reported as None, details carry
+    "gated": True, and the returned score is L. That is an upper bound
+    on Equation 5 (min(L, (S+M)/2) may be lower), so gated scores must
+    not be compared with or averaged into ungated ones.
     """
     
-    def __init__(self, llm_client, model_name="gpt-4o", temperature=0.3):
+    def __init__(self, llm_client, model_name="gpt-4o", temperature=0.3,
+                 l_gate=None, l_model_name=None):
         """
         Initialize PCC evaluator
         
@@ -31,10 +127,15 @@ class PCCEvaluator:
             llm_client: LLM API client for evaluation
             model_name: Model for PCC scoring (paper uses GPT-4o)
             temperature: Low temp for deterministic scoring
+            l_gate: Skip the S/M pass when L is below this score
+                (typically the PDS threshold, 0.6); None = single prompt
+            l_model_name: Model for the L-only pass (default: model_name)
         """
         self.llm_client = llm_client
         self.model_name = model_name
         self.temperature = temperature
+        self.l_gate = l_gate
+        self.l_model_name = l_model_name or model_name
     
     def evaluate(self, persona_traits: Dict, current_state: Dict, 
                  event: str, response: str) -> Tuple[float, Dict]:
@@ -48,34 +149,242 @@ class PCCEvaluator:
             response: Generated response to evaluate
         
         Returns:
-            final_pcc: Overall coherence score (0-1)
-            details: Dimensional subscores {L, S, M}
+            final_pcc: Overall coherence score (0-1); just L (an upper
+                bound) when the L gate skipped the S/M pass
+            details: Dimensional subscores {L, S, M}, plus "gated": True
+                when the S/M pass was skipped
         
         Implementation Note:
         Detailed prompt construction and evaluation rubric are provided
         in paper Appendix C. This implementation shows the framework structure.
         """
+        if self.l_gate is not None:
+            return self._evaluate_gated(
+                persona_traits, current_state, event, response
+            )
+        
         # Construct evaluation prompt
         # NOTE: Exact prompt wording in paper Appendix D
-        prompt = self._construct_pcc_prompt(
-            persona_traits, current_state, event, response
-        )
+        prompt = self._construct_pcc_prompt(current_state, event, response)
         
         # Call LLM evaluator
         result = self.llm_client.generate(
             prompt=prompt,
             model=self.model_name,
             temperature=self.temperature,
-            max_tokens=1000
+            max_tokens=PCC_MAX_TOKENS,
+            response_format=PCC_RESPONSE_FORMAT,
+            system_prefix=self._system_prefix(persona_traits)
         )
         
-        # Parse JSON response
-        try:
-            evaluation = json.loads(result)
-        except json.JSONDecodeError:
+        return self._score_evaluation(result)
+    
+    async def aevaluate(self, persona_traits: Dict, current_state: Dict,
+                        event: str, response: str) -> Tuple[float, Dict]:
+        """
+        Coroutine version of evaluate()
+        
+        Awaits llm_client.agenerate, so evaluations can run concurrently
+        with other LLM calls (e.g. the next event's impact assessment).
+        """
+        if self.l_gate is not None:
+            return await self._aevaluate_gated(
+                persona_traits, current_state, event, response
+            )
+        
+        prompt = self._construct_pcc_prompt(current_state, event, response)
+        
+        result = await self.llm_client.agenerate(
+            prompt=prompt,
+            model=self.model_name,
+            temperature=self.temperature,
+            max_tokens=PCC_MAX_TOKENS,
+            response_format=PCC_RESPONSE_FORMAT,
+            system_prefix=self._system_prefix(persona_traits)
+        )
+        
+        return self._score_evaluation(result)
+    
+    async def aevaluate_many(self, records: List[Dict],
+                             max_concurrency: int = 8) -> List[Tuple[float, Dict]]:
+        """
+        Evaluate many responses concurrently
+        
+        Args:
+            records: Keyword arguments for aevaluate(), one dict per response
+            max_concurrency: Max in-flight LLM calls (provider rate limits)
+        
+        Returns:
+            (final_pcc, details) per record, in input order
+        """
+        semaphore = asyncio.Semaphore(max_concurrency)
+        
+        async def bounded(record):
+            async with semaphore:
+                return await self.aevaluate(**record)
+        
+        return await asyncio.gather(*(bounded(r) for r in records))
+    
+    def evaluate_rows(self, records: List[Dict],
+                      batch_size: int = 8) -> List[Tuple[float, Dict]]:
+        """
+        Evaluate many responses, several per evaluator prompt
+        
+        Consecutive records sharing persona traits are packed, up to
+        batch_size at a time, into one prompt that lists them as
+        numbered rows; the traits and rubric are sent once per prompt
+        instead of once per response. Larger batches save more calls and
+        prefix tokens but lengthen each call (8-16 is a good range).
+        
+        Args:
+            records: Keyword arguments for evaluate(), one dict per response
+            batch_size: Max responses per evaluator prompt
+        
+        Returns:
+            (final_pcc, details) per record, in input order
+        """
+        scores = []
+        for traits, rows in self._row_batches(records, batch_size):
+            result = self.llm_client.generate(
+                prompt=self._construct_rows_prompt(rows),
+                model=self.model_name,
+                temperature=self.temperature,
+                max_tokens=PCC_MAX_TOKENS * len(rows),
+                response_format=PCC_ROWS_RESPONSE_FORMAT,
+                system_prefix=self._system_prefix(traits)
+            )
+            scores.extend(self._score_rows(result, len(rows)))
+        return scores
+    
+    async def aevaluate_rows(self, records: List[Dict],
+                             batch_size: int = 8) -> List[Tuple[float, Dict]]:
+        """Coroutine version of evaluate_rows(); batches are scored concurrently"""
+        async def score(traits, rows):
+            result = await self.llm_client.agenerate(
+                prompt=self._construct_rows_prompt(rows),
+                model=self.model_name,
+                temperature=self.temperature,
+                max_tokens=PCC_MAX_TOKENS * len(rows),
+                response_format=PCC_ROWS_RESPONSE_FORMAT,
+                system_prefix=self._system_prefix(traits)
+            )
+            return self._score_rows(result, len(rows))
+        
+        batches = await asyncio.gather(*(
+            score(traits, rows)
+            for traits, rows in self._row_batches(records, batch_size)
+        ))
+        return [scored for batch in batches for scored in batch]
+    
+    def evaluate_batch(self, records: List[Dict],
+                       poll_interval: float = 30.0) -> List[Tuple[float, Dict]]:
+        """
+        Evaluate many responses in one offline provider batch job
+        
+        Uses llm_client.generate_batch (OpenAI Batch API): half the cost
+        of per-request calls, but results may take up to 24h. Intended
+        for ablations and full-test-set PCC recomputation. Always uses
+        the single L/S/M prompt (no L gate).
+        
+        Args:
+            records: Keyword arguments for evaluate(), one dict per response
+            poll_interval: Seconds between batch status checks
+        
+        Returns:
+            (final_pcc, details) per record, in input order
+        """
+        prompts = [
+            self._construct_pcc_prompt(
+                r['current_state'], r['event'], r['response']
+            )
+            for r in records
+        ]
+        
+        results = self.llm_client.generate_batch(
+            prompts,
+            model=self.model_name,
+            temperature=self.temperature,
+            max_tokens=PCC_MAX_TOKENS,
+            response_format=PCC_RESPONSE_FORMAT,
+            poll_interval=poll_interval,
+            system_prefixes=[self._system_prefix(r['persona_traits'])
+                             for r in records]
+        )
+        
+        # Failed requests fall back like unparseable output
+        return [self._score_evaluation(result or "") for result in results]
+    
+    def _evaluate_gated(self, traits, state, event, response):
+        """L pass, then the S/M pass only if L clears the gate"""
+        L_score = self._score_l_pass(self.llm_client.generate(
+            prompt=self._construct_l_prompt(event, response),
+            model=self.l_model_name,
+            temperature=self.temperature,
+            max_tokens=PCC_MAX_TOKENS,
+            response_format=PCC_L_RESPONSE_FORMAT,
+            system_prefix=self._system_prefix(traits)
+        ))
+        if L_score < self.l_gate:
+            return L_score, {"L": L_score, "S": None, "M": None, "gated": True}
+        
+        result = self.llm_client.generate(
+            prompt=self._construct_sm_prompt(state, event, response),
+            model=self.model_name,
+            temperature=self.temperature,
+            max_tokens=PCC_MAX_TOKENS,
+            response_format=PCC_SM_RESPONSE_FORMAT,
+            system_prefix=self._system_prefix(traits)
+        )
+        return self._score_sm_pass(L_score, result)
+    
+    async def _aevaluate_gated(self, traits, state, event, response):
+        """Coroutine version of _evaluate_gated()"""
+        L_score = self._score_l_pass(await self.llm_client.agenerate(
+            prompt=self._construct_l_prompt(event, response),
+            model=self.l_model_name,
+            temperature=self.temperature,
+            max_tokens=PCC_MAX_TOKENS,
+            response_format=PCC_L_RESPONSE_FORMAT,
+            system_prefix=self._system_prefix(traits)
+        ))
+        if L_score < self.l_gate:
+            return L_score, {"L": L_score, "S": None, "M": None, "gated": True}
+        
+        result = await self.llm_client.agenerate(
+            prompt=self._construct_sm_prompt(state, event, response),
+            model=self.model_name,
+            temperature=self.temperature,
+            max_tokens=PCC_MAX_TOKENS,
+            response_format=PCC_SM_RESPONSE_FORMAT,
+            system_prefix=self._system_prefix(traits)
+        )
+        return self._score_sm_pass(L_score, result)
+    
+    def _score_evaluation(self, result: str) -> Tuple[float, Dict]:
+        """Parse evaluator output and aggregate dimensional scores"""
+        evaluation = self._parse(result)
+        if not isinstance(evaluation, dict):
             # Fallback to default scores
             return 0.5, {"L": 0.5, "S": 0.5, "M": 0.5}
+        return self._aggregate(evaluation)
+    
+    def _score_rows(self, result: str, n_rows: int) -> List[Tuple[float, Dict]]:
+        """Parse row-batched evaluator output; missing rows get default scores"""
+        fallback = (0.5, {"L": 0.5, "S": 0.5, "M": 0.5})
+        evaluation = self._parse(result)
+        if not isinstance(evaluation, dict):
+            return [fallback] * n_rows
         
+        scores = [fallback] * n_rows
+        for row in evaluation.get("rows", []):
+            row_id = row.get("id") if isinstance(row, dict) else None
+            # Row ids in the prompt are 1-based
+            if isinstance(row_id, int) and 1 <= row_id <= n_rows:
+                scores[row_id - 1] = self._aggregate(row)
+        return scores
+    
+    def _aggregate(self, evaluation: Dict) -> Tuple[float, Dict]:
+        """Dimensional scores and their PCC aggregate for one verdict"""
         # Calculate dimensional scores
         L_score = self._compute_L_score(evaluation)
         S_score = self._compute_S_score(evaluation)
@@ -86,23 +395,76 @@ class PCCEvaluator:
         
         return final_pcc, {"L": L_score, "S": S_score, "M": M_score}
     
-    def _construct_pcc_prompt(self, traits, state, event, response):
+    def _score_l_pass(self, result: str) -> float:
+        """L score from the L-only pass (0.5 if unparseable)"""
+        evaluation = self._parse(result)
+        if not isinstance(evaluation, dict):
+            return 0.5
+        return self._compute_L_score(evaluation)
+    
+    def _score_sm_pass(self, L_score: float, result: str) -> Tuple[float, Dict]:
+        """Aggregate a passed L score with the S/M pass output"""
+        evaluation = self._parse(result)
+        if not isinstance(evaluation, dict):
+            S_score = M_score = 0.5
+        else:
+            S_score = self._compute_S_score(evaluation)
+            M_score = self._compute_M_score(evaluation)
+        
+        # Final aggregation (Equation 5 in paper)
+        final_pcc = min(L_score, (S_score + M_score) / 2)
+        
+        return final_pcc, {"L": L_score, "S": S_score, "M": M_score}
+    
+    @staticmethod
+    def _parse(result: str):
         """
-        Construct PCC evaluation prompt
+        Parse evaluator JSON, or None if malformed
         
-        Template structure provided. Complete prompt engineering
-        details including NLI guidance and evidence requirements
-        are specified in paper Appendix D.
+        Callers still check for a dict: valid JSON may be an array or
+        a scalar. A missing completion (content=None on a refusal or
+        filtered output) raises TypeError in stdlib json.
         """
-        # Simplified template - see paper for complete version
-        prompt_template = """
+        # orjson.JSONDecodeError subclasses json's (a ValueError)
+        try:
+            if orjson is not None:
+                return orjson.loads(result)
+            return json.loads(result)
+        except (TypeError, ValueError):
+            return None
+    
+    def _system_prefix(self, traits):
+        """
+        Static part of the evaluator prompts: role, L traits and rubric
+        
+        Byte-identical for every call on a persona (L and S/M passes
+        alike), so providers serve it from their prompt cache (see
+        utils.prompt_builder); per-call data goes in the _construct_*
+        prompts.
+        """
+        return static_prefix(f"""
         You are a persona consistency evaluator.
         
         [L-layer Traits]
-        {traits}
+        {self._format_traits(traits)}
         
+        {PCC_RUBRIC}
+        """)
+    
+    def _construct_pcc_prompt(self, state, event, response):
+        """
+        Construct PCC evaluation prompt (per-call part)
+        
+        Template structure provided. Complete prompt engineering
+        details including NLI guidance and evidence requirements
+        are specified in paper Appendix D.
+        """
+        # Simplified template - see paper for complete version
+        # NOTE: Actual implementation uses more sophisticated prompt
+        # See paper Appendix D for complete specification
+        return f"""
         [Current State]
-        S={s_value}, M_meaning={m_meaning}, M_strain={m_strain}
+        S={state['S']}, M_meaning={state['M_meaning']}, M_strain={state['M_strain']}
         
         [Event]
         {event}
@@ -113,18 +475,81 @@ class PCCEvaluator:
         Evaluate across L/S/M dimensions with evidence.
         Output JSON format (see paper Appendix C for detailed rubric).
         """
+    
+    def _construct_rows_prompt(self, rows):
+        """
+        Construct the row-batched PCC prompt (per-call part)
         
-        # NOTE: Actual implementation uses more sophisticated prompt
-        # See paper Appendix D for complete specification
-        
-        return prompt_template.format(
-            traits=self._format_traits(traits),
-            s_value=state['S'],
-            m_meaning=state['M_meaning'],
-            m_strain=state['M_strain'],
-            event=event,
-            response=response
+        One numbered row per response; the shared traits and rubric are
+        in the system prefix, as for the single-response prompt.
+        """
+        row_text = "\n".join(
+            f"""
+        ({i}) [Current State] S={r['current_state']['S']}, M_meaning={r['current_state']['M_meaning']}, M_strain={r['current_state']['M_strain']}
+            [Event] {r['event']}
+            [Response] {r['response']}"""
+            for i, r in enumerate(rows, 1)
         )
+        
+        return f"""
+        [Rows]
+        {row_text}
+        
+        Evaluate every row across L/S/M dimensions with evidence.
+        Output JSON {{"rows": [...]}} with one entry per row id
+        (see paper Appendix C for detailed rubric).
+        """
+    
+    @staticmethod
+    def _row_batches(records, batch_size):
+        """Split records into runs of <= batch_size sharing persona traits"""
+        batches = []
+        for record in records:
+            traits = record['persona_traits']
+            if (batches and batches[-1][0] == traits
+                    and len(batches[-1][1]) < batch_size):
+                batches[-1][1].append(record)
+            else:
+                batches.append((traits, [record]))
+        return batches
+    
+    def _construct_l_prompt(self, event, response):
+        """
+        Construct the L-only evaluation prompt (gated mode, first pass)
+        
+        Same L rubric as the combined prompt (paper Appendix C); the
+        S/M state is omitted since L-Stability does not depend on it.
+        """
+        return f"""
+        [Event]
+        {event}
+        
+        [Response]
+        {response}
+        
+        Evaluate the L dimension only, with evidence.
+        Output JSON format (see paper Appendix C for detailed rubric).
+        """
+    
+    def _construct_sm_prompt(self, state, event, response):
+        """
+        Construct the S/M evaluation prompt (gated mode, second pass)
+        
+        Same S/M rubric as the combined prompt (paper Appendix C).
+        """
+        return f"""
+        [Current State]
+        S={state['S']}, M_meaning={state['M_meaning']}, M_strain={state['M_strain']}
+        
+        [Event]
+        {event}
+        
+        [Response]
+        {response}
+        
+        Evaluate the S and M dimensions only, with evidence.
+        Output JSON format (see paper Appendix C for detailed rubric).
+        """
     
     def _compute_L_score(self, evaluation):
         """
@@ -5,11 +5,68 @@ Implements dual-index retrieval as described in paper Section 4.3.1.
 
 Note: Exact retrieval weighting (λ=0.6) and scene categorization
 details are specified in paper Section 4.3.1.
+
+Storage layout (one directory per scene under the repository directory):
+    emb.f32      float32 [capacity, d] unit-norm event embeddings (memmap)
+    sm.f32       float32 [capacity, 3] (S, Mm, Ms) per case (memmap)
+    meta.jsonl   one line per case: event, response, S, Mm, Ms, pcc_score
+    info.json    {"dim": d}
+    index.hnsw   optional HNSW index snapshot (when hnswlib is installed)
+The number of cases is the number of complete lines in meta.jsonl;
+matrix rows past it are spare capacity. The index is checkpointed every
+`checkpoint_every` inserts and on close(); rows added after the last
+checkpoint are re-indexed on load.
 """
 
+import os
 import json
+import sqlite3
+import hashlib
+import threading
 import numpy as np
-from typing import List, Dict, Optional
+from collections import OrderedDict
+from typing import List, Dict, Optional, Union
+
+from utils.llm_interface import EMBEDDING_DIM, get_embeddings
+
+try:
+    import hnswlib
+except ImportError:  # ANN index is optional; retrieval falls back to exact scan
+    hnswlib = None
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; stdlib json is the fallback
+    orjson = None
+
+
+# Retrieval weighting, determined via ablation (paper Section 5.3)
+LAMBDA = 0.6
+
+# Max L1 state distance (three dimensions, each 0-10), see paper Section 4.3.1
+MAX_STATE_DISTANCE = 30.0
+
+# Shortlist size per requested case (at least MIN_SHORTLIST); the
+# shortlist from the ANN index or binary-code scan is rescored exactly
+SHORTLIST_PER_K = 8
+MIN_SHORTLIST = 32
+
+# Max inputs per embeddings API request
+EMBED_BATCH_SIZE = 2048
+
+# Set-bit count per byte value, for Hamming distance on packed codes
+_POPCOUNT = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+
+def _kernels():
+    """
+    core.kernels, imported on first retrieval
+    
+    Importing Numba takes longer than the rest of the package together,
+    so `import core` (and short runs that never retrieve) skip it.
+    """
+    from . import kernels
+    return kernels
 
 
 class PCRManager:
@@ -21,17 +78,61 @@ class PCRManager:
     - Psychological state proximity (S/M distance)
     
     RankScore = λ * semantic_sim + (1-λ) * state_proximity
+    
+    Each scene is a Structure-of-Arrays store: memory-mapped float32
+    matrices of L2-normalized embeddings and (S, Mm, Ms) values, plus an
+    append-only JSONL file of case metadata. Loading maps the matrices
+    instead of parsing them, and an insertion writes only its own rows.
+    
+    Large scenes are served in two passes: a shortlist by semantic
+    similarity, then the full RankScore on the shortlist only. The
+    shortlist comes from an HNSW index if hnswlib is installed, else from
+    a Hamming scan over 1-bit embedding codes (d/8 bytes per case). Small
+    scenes use the exact scan, which is faster than either at that size.
     """
     
-    def __init__(self, storage_path: str = "data/pcr_repository.json"):
+    def __init__(self, storage_path: str = "data/pcr_repository.json",
+                 ann_min_cases: int = 1024, embedding_client=None,
+                 embed_model: str = "text-embedding-ada-002",
+                 embedding_cache_path: Optional[str] = None,
+                 embedding_cache_size: int = 50000,
+                 checkpoint_every: int = 1000):
         """
         Initialize PCR manager
         
         Args:
-            storage_path: Path to PCR JSON file
+            storage_path: Repository path; cases are stored in the
+                directory of the same name without extension. A legacy
+                PCR JSON file at this path is imported on first load.
+            ann_min_cases: Scene size from which retrieval shortlists
+                candidates (ANN index or binary codes) before rescoring
+            embedding_client: OpenAI-compatible client exposing
+                embeddings.create (None = zero-vector placeholder)
+            embed_model: Embedding model name
+            embedding_cache_path: SQLite file caching embeddings across runs
+            embedding_cache_size: Max embeddings kept in memory
+            checkpoint_every: Inserts per scene between ANN index snapshots
         """
         self.storage_path = storage_path
-        self.repository = self._load_or_create()
+        self.storage_dir = os.path.splitext(storage_path)[0]
+        self.ann_min_cases = ann_min_cases
+        self.checkpoint_every = checkpoint_every
+        
+        # Embedding service, with text-hash keyed caches (memory LRU + SQLite);
+        # the lock guards both, since retrieve() also runs in executor threads
+        self.embedding_client = embedding_client
+        self.embed_model = embed_model
+        self.embedding_cache_size = embedding_cache_size
+        self._embedding_cache = OrderedDict()
+        self._embedding_lock = threading.Lock()
+        self._embedding_db = None
+        if embedding_cache_path is not None:
+            self._embedding_db = sqlite3.connect(embedding_cache_path,
+                                                 check_same_thread=False)
+            self._embedding_db.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings "
+                "(key TEXT PRIMARY KEY, vector BLOB)"
+            )
         
         # Universal scene categories (paper Section 4.3.1)
         self.scenes = [
@@ -40,9 +141,26 @@ class PCRManager:
             "task_execution",
             "conflict_resolution"
         ]
+        
+        # Per-scene stores; matrices grow by doubling, rows [:_size] are valid.
+        # retrieve() also runs in executor threads while inserts run on the
+        # event loop, so stores, indexes and codes are only touched under _lock
+        self._lock = threading.RLock()
+        self._store = {}  # scene -> {'E': memmap, 'SM': memmap, 'meta': list}
+        self._size = {}   # scene -> number of cases
+        self._bin = {}    # scene -> uint8 [n, ceil(d/8)] 1-bit codes (lazy)
+        self._index = {}  # scene -> HNSW index over the normalized embeddings
+        self._pending = {}  # scene -> rows indexed since the last snapshot
+        self._closed = False
+        self._load_or_create()
+        
+        if hnswlib is not None:
+            for scene in self._size:
+                self._load_or_build_index(scene)
     
     def add_case(self, scene: str, event: str, response: str,
-                 state: Dict, pcc_score: float, embedding: List[float]):
+                 state: Dict, pcc_score: float,
+                 embedding: Union[List[float], np.ndarray]):
         """
         Add high-quality case to repository
         
@@ -54,7 +172,8 @@ class PCRManager:
             response: High-scoring response
             state: S/M configuration at time of generation
             pcc_score: PCC score (must be >= 0.85)
-            embedding: Dense semantic vector of event
+            embedding: Dense semantic vector of event (list or ndarray;
+                converted to float32 once, on insert)
         """
         if pcc_score < 0.85:
             return  # Only admit high-quality cases
@@ -69,11 +188,85 @@ class PCRManager:
             'embedding': embedding
         }
         
-        if scene not in self.repository:
-            self.repository[scene] = []
+        self._insert(scene, [case])
+    
+    def add_cases_bulk(self, records: List[Dict]):
+        """
+        Add many cases, embedding all their events in batched API calls
+        
+        Same admission criterion as add_case. Each scene's store and
+        index grow once, instead of per case.
+        
+        Args:
+            records: Dicts with add_case arguments; 'embedding' is optional
+                and computed from 'event' when missing
+        """
+        admitted = [r for r in records if r['pcc_score'] >= 0.85]
+        
+        missing = [r for r in admitted if r.get('embedding') is None]
+        embeddings = self._get_embeddings([r['event'] for r in missing])
+        computed = {id(r): e for r, e in zip(missing, embeddings)}
         
-        self.repository[scene].append(case)
-        self._save()
+        by_scene = {}
+        for r in admitted:
+            by_scene.setdefault(r['scene'], []).append({
+                'event': r['event'],
+                'response': r['response'],
+                'S': r['state']['S'],
+                'Mm': r['state']['M_meaning'],
+                'Ms': r['state']['M_strain'],
+                'pcc_score': r['pcc_score'],
+                'embedding': computed.get(id(r), r.get('embedding'))
+            })
+        
+        for scene, cases in by_scene.items():
+            self._insert(scene, cases)
+    
+    def _insert(self, scene, cases):
+        """Append cases to the scene's store and index"""
+        with self._lock:
+            self._check_open()
+            start = self._size.get(scene, 0)
+            self._append_rows(scene, cases)
+            
+            if hnswlib is not None:
+                self._index_add(scene, start, self._size[scene])
+    
+    def checkpoint(self):
+        """Snapshot all ANN indexes with pending rows (atomic replace)"""
+        with self._lock:
+            for scene in list(self._pending):
+                self._save_index(scene)
+    
+    def close(self):
+        """
+        Checkpoint indexes and release the scene stores
+        
+        Later add_case/retrieve calls raise RuntimeError; reopen by
+        constructing a new PCRManager on the same storage_path.
+        """
+        with self._lock:
+            if self._closed:
+                return
+            self.checkpoint()
+            for store in self._store.values():
+                store['E'].flush()
+                store['SM'].flush()
+                store['log'].close()
+            self._store.clear()
+            self._size.clear()
+            self._bin.clear()
+            self._index.clear()
+            self._closed = True
+        with self._embedding_lock:
+            if self._embedding_db is not None:
+                self._embedding_db.close()
+                self._embedding_db = None
+    
+    def _check_open(self):
+        """Raise if close() has released the stores (caller holds _lock)"""
+        if self._closed:
+            raise RuntimeError(f"PCRManager is closed: {self.storage_path}")
     
     def retrieve(self, scene: str, event: str, state: Dict,
                  top_k: int = 3) -> List[Dict]:
@@ -95,89 +288,447 @@ class PCRManager:
         Note: λ weighting and StateProximity normalization details
         are specified in paper Section 4.3.1.
         """
-        if scene not in self.repository or len(self.repository[scene]) == 0:
+        with self._lock:
+            self._check_open()
+            n = self._size.get(scene, 0)
+        if n == 0 or top_k <= 0:
             return []
         
-        # Get event embedding for semantic similarity
-        event_embedding = self._get_embedding(event)
+        # Get event embedding for semantic similarity (already unit-norm);
+        # outside the lock, it may call the embedding service
+        query = self._get_embedding(event)
+        query_sm = np.array(
+            [state['S'], state['M_meaning'], state['M_strain']],
+            dtype=np.float32
+        )
         
-        # Rank all cases in this scene
-        ranked_cases = []
-        for case in self.repository[scene]:
-            # Semantic similarity (cosine)
-            semantic_sim = self._cosine_similarity(
-                event_embedding, case['embedding']
-            )
+        with self._lock:
+            # Inserts may have run meanwhile; rows only ever grow
+            self._check_open()
+            n = self._size[scene]
+            
+            # Candidate rows: shortlist for large scenes, else the whole scene
+            store = self._store[scene]
+            candidates = self._shortlist(scene, query, top_k)
+            kernels = _kernels()
+            if (candidates is None and kernels.pcr_topk is not None
+                    and kernels.kernel_threads() > 1):
+                # Fused parallel pass: score and select without score vectors
+                rows, scores = kernels.pcr_topk(
+                    np.asarray(store['E'][:n]), np.asarray(store['SM'][:n]),
+                    query, query_sm, LAMBDA, top_k, MAX_STATE_DISTANCE
+                )
+                return [
+                    {**store['meta'][row], 'rank_score': float(score)}
+                    for row, score in zip(rows, scores)
+                ]
             
-            # Psychological state proximity
-            # NOTE: Normalization factor (30.0) derivation in paper Section 4.3.1
-            state_proximity = self._compute_state_proximity(state, case)
+            if candidates is None:
+                embeddings = store['E'][:n]
+                case_sm = store['SM'][:n]
+            else:
+                embeddings = store['E'][candidates]
+                case_sm = store['SM'][candidates]
             
-            # Weighted combination
-            # NOTE: λ=0.6 determined via ablation (paper Section 5.3)
-            LAMBDA = 0.6  # See paper for justification
+            # Score all candidates at once
+            # Rows are unit-norm, so cosine similarity is a single mat-vec
+            semantic_sim = embeddings @ query
+            state_proximity = self._compute_state_proximity(query_sm, case_sm)
             rank_score = LAMBDA * semantic_sim + (1 - LAMBDA) * state_proximity
             
-            ranked_cases.append({
-                **case,
-                'rank_score': rank_score
-            })
-        
-        # Sort and return top-K
-        ranked_cases.sort(key=lambda x: x['rank_score'], reverse=True)
-        return ranked_cases[:top_k]
+            # Partition out top-K, then order only those
+            top = kernels.top_k_indices(rank_score, top_k)
+            rows = top if candidates is None else candidates[top]
+            
+            cases = store['meta']
+            return [
+                {**cases[row], 'rank_score': float(rank_score[i])}
+                for i, row in zip(top, rows)
+            ]
     
-    def _compute_state_proximity(self, query_state, case):
+    def _compute_state_proximity(self, query_sm, case_sm):
         """
-        Compute psychological state proximity
+        Compute psychological state proximity for a batch of cases
         
         Uses L1 distance normalized by maximum possible distance (30.0).
         See paper Section 4.3.1 for formula.
+        
+        Args:
+            query_sm: float32 [3] query (S, Mm, Ms)
+            case_sm: float32 [n, 3] case (S, Mm, Ms) rows
+        
+        Returns:
+            float32 [n] proximities
         """
-        distance = (
-            abs(query_state['S'] - case['S']) +
-            abs(query_state['M_meaning'] - case['Mm']) +
-            abs(query_state['M_strain'] - case['Ms'])
+        # Plain ndarray view: memmap rows are passed to the kernel uncopied
+        return _kernels().state_proximity_batch(
+            query_sm, np.asarray(case_sm), MAX_STATE_DISTANCE
         )
+    
+    @staticmethod
+    def _normalize(vec, copy=True):
+        """
+        Return float32 unit-norm embedding(s) (zeros stay zeros)
         
-        # Normalize and convert to proximity
-        # Max distance = 30.0 (three dimensions, each 0-10)
-        proximity = 1.0 - (distance / 30.0)
+        With copy=False a float32 ndarray input is normalized in place
+        (for freshly built arrays nobody else references).
+        """
+        vec = np.array(vec, dtype=np.float32, copy=copy or None)
+        norm = np.linalg.norm(vec, axis=-1, keepdims=True)
+        np.divide(vec, norm, out=vec, where=norm > 0)
+        return vec
+    
+    @staticmethod
+    def _quantize(vec):
+        """1-bit code of embedding(s): components above their mean, packed"""
+        return np.packbits(vec > vec.mean(axis=-1, keepdims=True), axis=-1)
+    
+    def _append_rows(self, scene, cases):
+        """
+        Append cases to the scene's store, doubling matrix capacity as needed
         
-        return proximity
+        Matrix rows are written and flushed before the metadata lines, so
+        an interrupted insert leaves only unused spare rows behind.
+        """
+        emb = self._normalize([case['embedding'] for case in cases])
+        sm = np.array(
+            [(case['S'], case['Mm'], case['Ms']) for case in cases],
+            dtype=np.float32
+        )
+        n = self._size.get(scene, 0)
+        m = len(cases)
+        
+        if scene not in self._store:
+            self._create_scene(scene, emb.shape[1])
+        store = self._store[scene]
+        
+        capacity = store['E'].shape[0]
+        if n + m > capacity:
+            while capacity < n + m:
+                capacity *= 2
+            self._grow_scene(scene, capacity)
+        
+        store['E'][n:n + m] = emb
+        store['SM'][n:n + m] = sm
+        store['E'].flush()
+        store['SM'].flush()
+        
+        meta = [
+            {key: case[key] for key in
+             ('event', 'response', 'S', 'Mm', 'Ms', 'pcc_score')}
+            for case in cases
+        ]
+        # One write of complete lines: the commit point of the insert
+        store['log'].write(b''.join(self._dump_line(line) for line in meta))
+        store['log'].flush()
+        store['meta'].extend(meta)
+        
+        if scene in self._bin:
+            self._bin[scene] = np.concatenate(
+                [self._bin[scene], self._quantize(emb)]
+            )
+        self._size[scene] = n + m
+    
+    def _shortlist(self, scene, query, top_k):
+        """
+        Shortlist case rows by semantic similarity
+        
+        Uses the scene's HNSW index when present, else the Hamming distance
+        between 1-bit codes (matching bits ~ cosine similarity). Returns
+        None when the scene should be scanned exactly (smaller than
+        ann_min_cases).
+        """
+        n = self._size[scene]
+        if n < self.ann_min_cases:
+            return None
+        
+        k = min(max(top_k * SHORTLIST_PER_K, MIN_SHORTLIST), n)
+        index = self._index.get(scene)
+        if index is not None:
+            index.set_ef(max(64, k))
+            labels, _ = index.knn_query(query, k=k)
+            return labels[0].astype(np.int64)
+        
+        if scene not in self._bin:
+            self._bin[scene] = self._quantize(self._store[scene]['E'][:n])
+        
+        xor = np.bitwise_xor(self._bin[scene], self._quantize(query))
+        if hasattr(np, 'bitwise_count'):  # NumPy >= 2.0
+            bits = np.bitwise_count(xor)
+        else:
+            bits = _POPCOUNT[xor]
+        hamming = bits.sum(axis=1, dtype=np.int32)
+        return np.argpartition(hamming, k - 1)[:k]
     
-    def _cosine_similarity(self, vec1, vec2):
-        """Compute cosine similarity between embeddings"""
-        vec1 = np.array(vec1)
-        vec2 = np.array(vec2)
+    def _index_path(self, scene):
+        """Path of the persisted HNSW index for a scene"""
+        return self._scene_path(scene, 'index.hnsw')
+    
+    def _load_or_build_index(self, scene):
+        """Load the scene's persisted index, rebuilding it if missing or stale"""
+        n = self._size[scene]
+        dim = self._store[scene]['E'].shape[1]
+        index = hnswlib.Index(space='ip', dim=dim)
+        
+        path = self._index_path(scene)
+        if os.path.exists(path):
+            index.load_index(path, max_elements=max(n, 1024))
+            indexed = index.get_current_count()
+            if indexed <= n:
+                # Rows are append-only: index only those past the snapshot
+                self._index[scene] = index
+                if indexed < n:
+                    index.add_items(self._store[scene]['E'][indexed:n],
+                                    np.arange(indexed, n))
+                    self._pending[scene] = n - indexed
+                return
+            index = hnswlib.Index(space='ip', dim=dim)
         
-        dot_product = np.dot(vec1, vec2)
-        norm_product = np.linalg.norm(vec1) * np.linalg.norm(vec2)
+        # Inner product on unit-norm rows equals cosine similarity
+        index.init_index(max_elements=max(n, 1024), ef_construction=200, M=16)
+        index.add_items(self._store[scene]['E'][:n], np.arange(n))
+        self._index[scene] = index
+        self._pending[scene] = n
+    
+    def _index_add(self, scene, start, stop):
+        """Insert case rows [start, stop) into the scene's index and persist it"""
+        index = self._index.get(scene)
+        if index is None:
+            index = hnswlib.Index(space='ip', dim=self._store[scene]['E'].shape[1])
+            index.init_index(max_elements=max(stop, 1024),
+                             ef_construction=200, M=16)
+            self._index[scene] = index
+        elif stop > index.get_max_elements():
+            index.resize_index(max(stop, 2 * index.get_max_elements()))
         
-        if norm_product == 0:
-            return 0.0
+        index.add_items(self._store[scene]['E'][start:stop],
+                        np.arange(start, stop))
         
-        return dot_product / norm_product
+        # Snapshot periodically rather than rewriting the index per insert
+        self._pending[scene] = self._pending.get(scene, 0) + stop - start
+        if self._pending[scene] >= self.checkpoint_every:
+            self._save_index(scene)
+    
+    def _save_index(self, scene):
+        """Write the scene's index to a temp file and swap it in atomically"""
+        path = self._index_path(scene)
+        tmp = path + '.tmp'
+        self._index[scene].save_index(tmp)
+        os.replace(tmp, path)
+        self._pending.pop(scene, None)
     
     def _get_embedding(self, text):
         """
         Get dense embedding for text
         
         Paper uses OpenAI text-embedding-ada-002
-        Placeholder implementation - integrate with your embedding service
+        
+        Returns:
+            float32 [EMBEDDING_DIM] unit-norm vector
         """
-        # Placeholder - replace with actual embedding API call
-        return [0.0] * 1536
+        vec = self._cached_embedding(self._text_key(text))
+        if vec is None:
+            vec = self._get_embeddings([text])[0]
+        return vec
+    
+    def _get_embeddings(self, texts: List[str]) -> np.ndarray:
+        """
+        Get dense embeddings for many texts
+        
+        Texts are keyed by sha256; cached ones (memory LRU, then SQLite)
+        skip the API, and the remaining unique texts go out in requests
+        of up to EMBED_BATCH_SIZE inputs. Vectors are normalized once
+        before caching, so cosine similarity against the unit-norm case
+        rows is a plain dot product with no per-query norm.
+        
+        Returns:
+            float32 [len(texts), EMBEDDING_DIM], unit-norm rows
+        """
+        keys = [self._text_key(t) for t in texts]
+        vectors = {}
+        for key in keys:
+            if key not in vectors:
+                vec = self._cached_embedding(key)
+                if vec is not None:
+                    vectors[key] = vec
+        
+        pending = {}
+        for key, text in zip(keys, texts):
+            if key not in vectors:
+                pending[key] = text
+        
+        if pending:
+            pending_keys = list(pending)
+            fetched = self._normalize(
+                self._embed_texts([pending[k] for k in pending_keys]),
+                copy=False
+            )
+            with self._embedding_lock:
+                for key, vec in zip(pending_keys, fetched):
+                    vectors[key] = vec
+                    # Zero placeholders (no embedding client) are not cached,
+                    # so a client configured later is asked for real vectors
+                    if vec.any():
+                        self._cache_embedding(key, vec)
+                if self._embedding_db is not None:
+                    self._embedding_db.commit()
+        
+        if not keys:
+            return np.empty((0, EMBEDDING_DIM), dtype=np.float32)
+        return np.stack([vectors[key] for key in keys])
+    
+    @staticmethod
+    def _text_key(text):
+        """Embedding cache key of a text"""
+        return hashlib.sha256(text.encode('utf-8')).hexdigest()
+    
+    def _embed_texts(self, texts):
+        """Call the embedding service in chunks of EMBED_BATCH_SIZE"""
+        return get_embeddings(texts, batch_size=EMBED_BATCH_SIZE,
+                              client=self.embedding_client,
+                              model=self.embed_model)
+    
+    def _cached_embedding(self, key):
+        """Look up an embedding by text hash (memory, then SQLite)"""
+        with self._embedding_lock:
+            vec = self._embedding_cache.get(key)
+            if vec is not None:
+                self._embedding_cache.move_to_end(key)
+                return vec
+            
+            if self._embedding_db is not None:
+                row = self._embedding_db.execute(
+                    "SELECT vector FROM embeddings WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    vec = np.frombuffer(row[0], dtype=np.float32)
+                    self._remember_embedding(key, vec)
+                    return vec
+            return None
+    
+    def _cache_embedding(self, key, vec):
+        """
+        Store an embedding in both cache tiers
+        
+        Caller holds _embedding_lock and commits SQLite.
+        """
+        self._remember_embedding(key, vec)
+        if self._embedding_db is not None:
+            self._embedding_db.execute(
+                "INSERT OR REPLACE INTO embeddings VALUES (?, ?)",
+                (key, vec.tobytes())
+            )
+    
+    def _remember_embedding(self, key, vec):
+        """Insert into the in-memory LRU, evicting the oldest entry if full"""
+        self._embedding_cache[key] = vec
+        self._embedding_cache.move_to_end(key)
+        if len(self._embedding_cache) > self.embedding_cache_size:
+            self._embedding_cache.popitem(last=False)
+    
+    @staticmethod
+    def _dump_line(record):
+        """One JSONL line as UTF-8 bytes"""
+        if orjson is not None:
+            # NumPy scalars (e.g. clipped S/M values) serialize as numbers
+            return orjson.dumps(record, option=orjson.OPT_SERIALIZE_NUMPY) + b'\n'
+        return (json.dumps(record, ensure_ascii=False) + '\n').encode('utf-8')
+    
+    @staticmethod
+    def _read_log(path):
+        """
+        Read a scene's metadata log, dropping a torn trailing line
+        
+        A crash mid-write can leave an incomplete last line; it is cut
+        off so later appends start on a clean line.
+        """
+        with open(path, 'rb') as f:
+            data = f.read()
+        end = data.rfind(b'\n') + 1
+        if end < len(data):
+            with open(path, 'r+b') as f:
+                f.truncate(end)
+        loads = orjson.loads if orjson is not None else json.loads
+        return [loads(line) for line in data[:end].splitlines() if line.strip()]
+    
+    def _scene_path(self, scene, name):
+        """Path of one of a scene's store files"""
+        return os.path.join(self.storage_dir, scene, name)
+    
+    @staticmethod
+    def _open_matrix(path, cols, capacity):
+        """Memory-map a float32 [capacity, cols] matrix file, sizing it first"""
+        size = capacity * cols * 4
+        mode = 'r+b' if os.path.exists(path) else 'w+b'
+        with open(path, mode) as f:
+            f.seek(0, os.SEEK_END)
+            if f.tell() < size:
+                f.truncate(size)
+        return np.memmap(path, dtype=np.float32, mode='r+',
+                         shape=(capacity, cols))
+    
+    def _create_scene(self, scene, dim, capacity=64):
+        """Create an empty on-disk store for a scene"""
+        os.makedirs(os.path.join(self.storage_dir, scene), exist_ok=True)
+        info_path = self._scene_path(scene, 'info.json')
+        with open(info_path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump({'dim': dim}, f)
+        os.replace(info_path + '.tmp', info_path)
+        self._store[scene] = {
+            'E': self._open_matrix(self._scene_path(scene, 'emb.f32'),
+                                   dim, capacity),
+            'SM': self._open_matrix(self._scene_path(scene, 'sm.f32'),
+                                    3, capacity),
+            'meta': [],
+            'log': open(self._scene_path(scene, 'meta.jsonl'), 'ab')
+        }
+    
+    def _grow_scene(self, scene, capacity):
+        """Extend a scene's matrix files to a new row capacity and remap"""
+        store = self._store[scene]
+        dim = store['E'].shape[1]
+        for key, name, cols in (('E', 'emb.f32', dim), ('SM', 'sm.f32', 3)):
+            old = store.pop(key)
+            old.flush()
+            del old
+            store[key] = self._open_matrix(self._scene_path(scene, name),
+                                           cols, capacity)
     
     def _load_or_create(self):
-        """Load existing repository or create empty"""
+        """Map existing scene stores, or import a legacy JSON repository"""
+        if not os.path.isdir(self.storage_dir):
+            self._import_legacy_json()
+            return
+        
+        for scene in sorted(os.listdir(self.storage_dir)):
+            info_path = self._scene_path(scene, 'info.json')
+            if not os.path.exists(info_path):
+                continue
+            with open(info_path, 'r', encoding='utf-8') as f:
+                dim = json.load(f)['dim']
+            log_path = self._scene_path(scene, 'meta.jsonl')
+            meta = self._read_log(log_path)
+            
+            # Capacity follows from file size; rows past len(meta) are spare
+            emb_path = self._scene_path(scene, 'emb.f32')
+            capacity = max(os.path.getsize(emb_path) // (dim * 4), len(meta), 1)
+            self._store[scene] = {
+                'E': self._open_matrix(emb_path, dim, capacity),
+                'SM': self._open_matrix(self._scene_path(scene, 'sm.f32'),
+                                        3, capacity),
+                'meta': meta,
+                'log': open(log_path, 'ab')
+            }
+            self._size[scene] = len(meta)
+    
+    def _import_legacy_json(self):
+        """Import cases from a PCR JSON file (pre-binary-store format)"""
         try:
             with open(self.storage_path, 'r', encoding='utf-8') as f:
-                return json.load(f)
+                repository = json.load(f)
         except FileNotFoundError:
-            return {scene: [] for scene in self.scenes}
-    
-    def _save(self):
-        """Save repository to disk"""
-        with open(self.storage_path, 'w', encoding='utf-8') as f:
-            json.dump(self.repository, f, ensure_ascii=False, indent=2)
+            return
+        
+        for scene, cases in repository.items():
+            if cases:
+                self._append_rows(scene, cases)
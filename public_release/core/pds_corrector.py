@@ -7,7 +7,11 @@ Note: Case-guided rewriting prompt engineering details (how to construct
 exemplar demonstrations and instruct style learning) are in paper Appendix D.
 """
 
-from typing import List, Dict, Optional
+import asyncio
+import functools
+from typing import List, Dict, Optional, Tuple
+
+from utils.prompt_builder import static_prefix
 
 
 class PDSCorrector:
@@ -74,6 +78,45 @@ class PDSCorrector:
         
         return corrected, True
     
+    async def acorrect_if_needed(self, pcc_score: float, response: str,
+                                 persona_traits: Dict, current_state: Dict,
+                                 event: str, scene: str) -> Tuple[str, bool]:
+        """
+        Coroutine version of correct_if_needed()
+        
+        PCR retrieval (embedding lookup + scoring) runs in the default
+        executor and the rewrite awaits llm_client.agenerate, so other
+        events' LLM calls can proceed while this one waits.
+        """
+        if pcc_score >= self.threshold:
+            return response, False  # No correction needed
+        
+        loop = asyncio.get_running_loop()
+        similar_cases = await loop.run_in_executor(None, functools.partial(
+            self.pcr.retrieve,
+            scene=scene,
+            event=event,
+            state=current_state,
+            top_k=3
+        ))
+        
+        if len(similar_cases) == 0:
+            prompt = self._l_only_prompt(
+                response, persona_traits, current_state, event
+            )
+        else:
+            prompt = self._case_guided_prompt(
+                response, persona_traits, current_state, event, similar_cases
+            )
+        
+        corrected = await self.llm_client.agenerate(
+            prompt=prompt,
+            temperature=0.7,
+            system_prefix=self._system_prefix(persona_traits)
+        )
+        
+        return corrected, True
+    
     def _l_only_correction(self, response, traits, state, event):
         """
         Early-stage correction using only L-layer constraints
@@ -81,18 +124,38 @@ class PDSCorrector:
         Prompt design: Prioritize trait preservation over state nuance
         Complete prompt in paper Appendix D, Section D.5.1
         """
-        # Construct L-only correction prompt
-        # NOTE: Exact prompt wording in paper Appendix D
+        corrected = self.llm_client.generate(
+            prompt=self._l_only_prompt(response, traits, state, event),
+            temperature=0.7,
+            system_prefix=self._system_prefix(traits)
+        )
         
-        prompt_template = """
-        You are a persona consistency expert. Rewrite the following response
-        to ensure character trait compliance.
+        return corrected
+    
+    def _system_prefix(self, traits):
+        """
+        Static part of both correction prompts: role and traits
         
-        [Character Traits]
-        {traits}
+        Byte-identical for every rewrite of a persona, so providers serve
+        it from their prompt cache (see utils.prompt_builder). Each mode's
+        rewriting instructions go in its own per-call prompt.
+        """
+        return static_prefix(f"""
+        You are a persona consistency expert. Rewrite responses to ensure
+        character trait compliance.
         
+        [Character Traits]
+        {self._format_traits(traits)}
+        """)
+    
+    def _l_only_prompt(self, response, traits, state, event):
+        """Construct L-only correction prompt (per-call part)"""
+        # NOTE: Exact prompt wording in paper Appendix D
+        # Simplified implementation
+        # Actual prompt includes detailed trait-checking instructions
+        return f"""
         [Current State]
-        S={s}, M_meaning={mm}, M_strain={ms}
+        S={state['S']}, M_meaning={state['M_meaning']}, M_strain={state['M_strain']}
         
         [Event]
         {event}
@@ -109,23 +172,6 @@ class PDSCorrector:
         
         Rewritten response:
         """
-        
-        # Simplified implementation
-        # Actual prompt includes detailed trait-checking instructions
-        
-        corrected = self.llm_client.generate(
-            prompt=prompt_template.format(
-                traits=self._format_traits(traits),
-                s=state['S'],
-                mm=state['M_meaning'],
-                ms=state['M_strain'],
-                event=event,
-                response=response
-            ),
-            temperature=0.7
-        )
-        
-        return corrected
     
     def _case_guided_correction(self, response, traits, state, event, cases):
         """
@@ -137,6 +183,18 @@ class PDSCorrector:
         Complete prompt engineering (how to format cases, how to instruct
         strategy learning) specified in paper Appendix D, Section D.5.2.
         """
+        corrected = self.llm_client.generate(
+            prompt=self._case_guided_prompt(
+                response, traits, state, event, cases
+            ),
+            temperature=0.7,
+            system_prefix=self._system_prefix(traits)
+        )
+        
+        return corrected
+    
+    def _case_guided_prompt(self, response, traits, state, event, cases):
+        """Construct case-guided correction prompt (per-call part)"""
         # Format retrieved cases for demonstration
         case_examples = self._format_cases_for_prompt(cases)
         
@@ -144,13 +202,10 @@ class PDSCorrector:
         # NOTE: Critical prompt design details in paper Appendix D
         # Includes: how to prevent mechanical copying, how to emphasize
         # learning expression patterns, etc.
-        
-        prompt_template = """
+        # Simplified implementation
+        return f"""
         Rewrite with reference to high-quality cases.
         
-        [Character Traits]
-        {traits}
-        
         [Current State]
         {state}
         
@@ -158,7 +213,7 @@ class PDSCorrector:
         {response}
         
         [Retrieved High-Quality Cases]
-        {cases}
+        {case_examples}
         
         [Rewriting Instructions]
         LEARN the expression patterns from cases (not copy content).
@@ -167,19 +222,6 @@ class PDSCorrector:
         
         Rewritten response:
         """
-        
-        # Simplified implementation
-        corrected = self.llm_client.generate(
-            prompt=prompt_template.format(
-                traits=self._format_traits(traits),
-                state=state,
-                response=response,
-                cases=case_examples
-            ),
-            temperature=0.7
-        )
-        
-        return corrected
     
     def _format_cases_for_prompt(self, cases: List[Dict]) -> str:
         """
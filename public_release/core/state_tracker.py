@@ -7,7 +7,31 @@ Note: M-layer discretization (9-bucket system) details are in paper Section 4.1.
 This implementation provides the framework structure.
 """
 
-from typing import Dict, Tuple
+import numpy as np
+from collections import deque
+from typing import Dict, List, Tuple
+
+from utils.prompt_builder import static_prefix
+
+
+# M-layer level boundaries: low <= 3.3 < medium <= 6.6 < high
+M_LEVEL_THRESHOLDS = np.array([3.3, 6.6])
+
+# Semantic description per (meaning level, strain level), 0=low .. 2=high
+# NOTE: Complete semantic descriptions for all 9 buckets
+# are specified in paper Section 4.1.1
+M_DESCRIPTIONS = np.array([
+    # columns: strain low / medium / high
+    ["Balanced state",                                    # meaning low
+     "Balanced state",
+     "Questioning meaning under high strain"],
+    ["Balanced state",                                    # meaning medium
+     "Moderate purpose and pressure",
+     "Balanced state"],
+    ["Clear goals but manageable stress",                 # meaning high
+     "Balanced state",
+     "Balanced state"],
+], dtype=object)
 
 
 class StateTracker:
@@ -17,14 +41,20 @@ class StateTracker:
     - L-layer: Time-invariant traits (loaded from config)
     - M-layer: Mid-term meaning/strain (cumulative updates)
     - S-layer: Short-term affect (cumulative updates)
+    
+    History is a fixed-size circular buffer of (S, Mm, Ms, t) rows, t
+    being the update count; only the latest `max_history` updates are
+    kept, and history_array() returns them oldest first for vectorized
+    analyses (trends, describe_m_states over a whole trajectory).
     """
     
-    def __init__(self, persona_config: Dict):
+    def __init__(self, persona_config: Dict, max_history: int = 1024):
         """
         Initialize state tracker with persona configuration
         
         Args:
             persona_config: JSON config with L-layer traits and initial S/M
+            max_history: Number of most recent state updates kept
         """
         # L-layer (immutable)
         self.L_traits = {
@@ -39,8 +69,11 @@ class StateTracker:
         self.M_meaning = initial.get('m_meaning', 5.0)
         self.M_strain = initial.get('m_strain', 5.0)
         
-        # History tracking
-        self.state_history = []
+        # History tracking (circular buffer; _hist_idx = updates so far)
+        self.max_history = max_history
+        self._hist = np.empty((max_history, 4), dtype=np.float32)
+        self._hist_idx = 0
+        self._hist_deltas = deque(maxlen=max_history)
     
     def update_state(self, event: str, llm_client) -> Tuple[float, float, float]:
         """
@@ -58,18 +91,42 @@ class StateTracker:
         # Assess psychological impact (see paper Section 4.1.2)
         deltas = self._assess_psychological_impact(event, llm_client)
         
+        return self.apply_deltas(deltas)
+    
+    async def aupdate_state(self, event: str,
+                            llm_client) -> Tuple[float, float, float]:
+        """
+        Coroutine version of update_state()
+        
+        Only the impact assessment is awaited; the state update itself
+        runs synchronously, so concurrent callers cannot interleave it.
+        """
+        result = await llm_client.agenerate(
+            prompt=self._impact_prompt(event),
+            temperature=0.3,
+            system_prefix=self._impact_prefix()
+        )
+        
+        return self.apply_deltas(self._parse_impact(result))
+    
+    def apply_deltas(self, deltas: Dict) -> Tuple[float, float, float]:
+        """
+        Apply assessed deltas to S/M and record history
+        
+        Also used by FusedChain, which assesses the deltas as part of
+        its single call.
+        """
         # Cumulative update with clipping
         self.S = self._clip(self.S + deltas['S'], 0, 10)
         self.M_meaning = self._clip(self.M_meaning + deltas['M_meaning'], 0, 10)
         self.M_strain = self._clip(self.M_strain + deltas['M_strain'], 0, 10)
         
         # Record history
-        self.state_history.append({
-            'S': self.S,
-            'M_meaning': self.M_meaning,
-            'M_strain': self.M_strain,
-            'deltas': deltas
-        })
+        self._hist[self._hist_idx % self.max_history] = (
+            self.S, self.M_meaning, self.M_strain, self._hist_idx
+        )
+        self._hist_idx += 1
+        self._hist_deltas.append(deltas)
         
         return deltas['S'], deltas['M_meaning'], deltas['M_strain']
     
@@ -81,6 +138,28 @@ class StateTracker:
             'M_strain': self.M_strain
         }
     
+    def history_array(self) -> np.ndarray:
+        """
+        Recorded states as float32 [n, 4] rows of (S, Mm, Ms, t), oldest first
+        
+        A view of the buffer until it wraps, a reordered copy afterwards.
+        """
+        H = self.max_history
+        if self._hist_idx <= H:
+            return self._hist[:self._hist_idx]
+        head = self._hist_idx % H
+        return np.concatenate([self._hist[head:], self._hist[:head]])
+    
+    @property
+    def state_history(self) -> List[Dict]:
+        """Recorded states as dicts (S, M_meaning, M_strain, deltas), oldest first"""
+        return [
+            {'S': float(S), 'M_meaning': float(Mm), 'M_strain': float(Ms),
+             'deltas': deltas}
+            for (S, Mm, Ms, _), deltas in zip(self.history_array(),
+                                              self._hist_deltas)
+        ]
+    
     def get_L_traits(self) -> Dict:
         """Get immutable L-layer traits"""
         return self.L_traits
@@ -95,33 +174,44 @@ class StateTracker:
         Implementation note: Actual prompt includes L-layer conditioning
         to ensure identical events affect different personas differently.
         """
-        # Construct impact assessment prompt
+        # Call LLM for impact assessment
+        # Simplified placeholder - actual implementation uses detailed rubric
+        result = llm_client.generate(
+            prompt=self._impact_prompt(event),
+            temperature=0.3,
+            system_prefix=self._impact_prefix()
+        )
+        
+        return self._parse_impact(result)
+    
+    def _impact_prefix(self):
+        """
+        Static part of the impact assessment prompt (rubric, L traits)
+        
+        Depends only on the immutable L-layer, so it is byte-identical
+        for every event and served from the provider's prompt cache.
+        """
         # NOTE: Complete prompt specification in paper Appendix D
         
-        prompt_template = """
+        return static_prefix(f"""
         Assess psychological impact of this event on:
         - S (short-term emotion): -2.0 to +2.0
         - M_meaning (purpose/value): -2.0 to +2.0  
         - M_strain (stress): -2.0 to +2.0
         
-        Event: {event}
-        Persona traits: {traits}
+        Persona traits: {self.L_traits}
         
         Output format: S=X.X Mm=Y.Y Ms=Z.Z
         
         [Full rubric and examples in paper Appendix D]
-        """
-        
-        # Call LLM for impact assessment
-        # Simplified placeholder - actual implementation uses detailed rubric
-        result = llm_client.generate(
-            prompt=prompt_template.format(
-                event=event,
-                traits=self.L_traits
-            ),
-            temperature=0.3
-        )
-        
+        """)
+    
+    def _impact_prompt(self, event):
+        """Construct impact assessment prompt (per-call part)"""
+        return f"Event: {event}"
+    
+    def _parse_impact(self, result):
+        """Parse S/M deltas from impact assessment output"""
         # Parse deltas (simplified)
         # Actual implementation includes validation and bounds checking
         return {
@@ -141,29 +231,18 @@ class StateTracker:
         Implementation note: Complete 9-bucket discretization mapping
         provided in paper Section 4.1.1. This shows simplified version.
         """
-        # Simplified 3-level categorization (actual uses 3x3 grid)
-        if self.M_meaning > 6.6:
-            meaning_level = "high"
-        elif self.M_meaning > 3.3:
-            meaning_level = "medium"
-        else:
-            meaning_level = "low"
-        
-        if self.M_strain > 6.6:
-            strain_level = "high"
-        elif self.M_strain > 3.3:
-            strain_level = "medium"
-        else:
-            strain_level = "low"
-        
-        # NOTE: Complete semantic descriptions for all 9 buckets
-        # are specified in paper Section 4.1.1
-        
-        descriptions = {
-            ("high", "low"): "Clear goals but manageable stress",
-            ("medium", "medium"): "Moderate purpose and pressure",
-            ("low", "high"): "Questioning meaning under high strain",
-            # ... other 6 buckets (see paper for complete mapping)
-        }
+        return str(self.describe_m_states(self.M_meaning, self.M_strain))
+    
+    @staticmethod
+    def describe_m_states(m_meaning, m_strain):
+        """
+        Vectorized M-layer description lookup
         
-        return descriptions.get((meaning_level, strain_level), "Balanced state")
+        Levels come from np.searchsorted on the two thresholds (a value
+        equal to a threshold falls in the lower level), then index the
+        3x3 M_DESCRIPTIONS table. Accepts scalars or arrays, e.g. a
+        whole state history at once.
+        """
+        meaning_level = np.searchsorted(M_LEVEL_THRESHOLDS, m_meaning)
+        strain_level = np.searchsorted(M_LEVEL_THRESHOLDS, m_strain)
+        return M_DESCRIPTIONS[meaning_level, strain_level]
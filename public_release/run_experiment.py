@@ -8,14 +8,25 @@ see paper Section 5.1 for configuration details.
 """
 
 import json
+import random
+import asyncio
 import argparse
 from pathlib import Path
 
+import numpy as np
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; stdlib json is the fallback
+    orjson = None
+
 # NOTE: Actual imports would be:
-# from core.pcc_evaluator import PCCEvaluator
+# from core.pcc_evaluator import PCCEvaluator, RUBRIC_VERSION
 # from core.pds_corrector import PDSCorrector
 # from core.pcr_manager import PCRManager
 # from core.state_tracker import StateTracker
+# from core.fused_chain import FusedChain
+# from utils import LLMClient, SemanticCache
 
 print("""
 ====================================================================
@@ -35,24 +46,208 @@ Complete implementation available upon paper acceptance.
 """)
 
 
-def run_simple_experiment(persona_config_path, event_sequence, llm_provider):
+# One record of the S/M trajectory; analyses slice columns by field name
+STATE_DTYPE = np.dtype([('S', 'f4'), ('M_meaning', 'f4'), ('M_strain', 'f4')])
+
+
+def load_json(path):
+    """Parse a JSON file (orjson when installed; both accept raw bytes)"""
+    loads = orjson.loads if orjson is not None else json.loads
+    return loads(Path(path).read_bytes())
+
+
+def dump_results(results, path):
+    """
+    Write the per-seed results as one JSON array
+    
+    NumPy arrays are passed to orjson as-is (OPT_SERIALIZE_NUMPY). The
+    structured state trajectory is not supported there, so it is written
+    as one contiguous column per STATE_DTYPE field.
+    """
+    records = [
+        {**r, 'state_trajectory': {
+            name: np.ascontiguousarray(r['state_trajectory'][name])
+            for name in STATE_DTYPE.names
+        }}
+        for r in results
+    ]
+    if orjson is not None:
+        data = orjson.dumps(records, option=orjson.OPT_SERIALIZE_NUMPY
+                            | orjson.OPT_INDENT_2)
+    else:
+        data = json.dumps(records, indent=2, ensure_ascii=False,
+                          default=lambda a: a.tolist()).encode('utf-8')
+    Path(path).write_bytes(data)
+
+
+async def embed_stage(event, semaphore):
+    """Event embedding for PCR lookup/insertion (independent of S/M)"""
+    # async with semaphore:
+    #     return await llm_client.aget_embedding(event)
+    
+    return None  # Placeholder
+
+
+async def update_stage(event, embedding, semaphore):
+    """
+    Stage 1: update S/M for the event
+    
+    The event embedding used for PCR lookup/insertion does not depend on
+    the update; it arrives as a task started earlier (see
+    run_simple_experiment) that runs while the update waits.
+    
+    Returns:
+        current_state, embedding
+    """
+    # async with semaphore:
+    #     deltas = await state_tracker.aupdate_state(event, llm_client)
+    # current_state = state_tracker.get_current_state()
+    
+    # Placeholder
+    current_state = {'S': 5.0, 'M_meaning': 5.0, 'M_strain': 5.0}
+    embedding = await embedding
+    return current_state, embedding
+
+
+async def respond_stage(event, current_state, semaphore):
+    """Stage 2: generate response conditioned on L + current S/M"""
+    # async with semaphore:
+    #     return await agenerate_response(persona_traits, current_state, event, llm_client)
+    
+    return "[Generated response placeholder]"
+
+
+async def score_stage(batch, semaphore, pcc_batch_size):
+    """
+    Stage 3: PCC evaluation, PDS correction, PCR insertion for a batch
+    
+    All responses of the batch are scored by one row-batched PCC prompt
+    (PCCEvaluator.aevaluate_rows); corrections of low-PCC rows then run
+    concurrently.
+    
+    Args:
+        batch: (event, current_state, embedding, response) per event
+        semaphore: Bounds in-flight LLM calls
+        pcc_batch_size: Max responses per PCC prompt
+    
+    Returns:
+        (response (corrected if needed), pcc_score, corrected, details)
+        per event
+    """
+    # async with semaphore:
+    #     scored = await pcc.aevaluate_rows([
+    #         {'persona_traits': persona_traits, 'current_state': current_state,
+    #          'event': event, 'response': response}
+    #         for event, current_state, embedding, response in batch
+    #     ], batch_size=pcc_batch_size)
+    
+    scored = [(0.85, {})] * len(batch)  # Placeholder
+    
+    return await asyncio.gather(*(
+        correct_stage(item, pcc_score, details, semaphore)
+        for item, (pcc_score, details) in zip(batch, scored)
+    ))
+
+
+async def correct_stage(item, pcc_score, details, semaphore):
+    """
+    PDS correction (low PCC only) and PCR insertion for one scored event
+    
+    Args:
+        item: (event, current_state, embedding, response)
+        pcc_score: PCC of the response
+        details: PCC dimensional scores ("gated" set if S/M were skipped)
+        semaphore: Bounds in-flight LLM calls
+    
+    Returns:
+        response (corrected if needed), pcc_score, corrected, details
+    """
+    event, current_state, embedding, response = item
+    
+    # Correct if needed
+    corrected = False
+    # if pcc_score < 0.6:
+    #     async with semaphore:
+    #         response, corrected = await pds.acorrect_if_needed(...)
+    
+    # Add to PCR if high quality
+    # if pcc_score >= 0.85:
+    #     pcr.add_case(scene, event, response, current_state, pcc_score, embedding)
+    
+    return response, pcc_score, corrected, details
+
+
+async def chain_stage(event, embedding, semaphore):
+    """
+    Fused stages 1-3: S/M update, response and PCC in one streamed call
+    
+    Returns as soon as the streamed deltas are applied
+    (FusedChain.astream_step), so the next event's call starts while
+    this response and its PCC are still streaming. The event embedding
+    task runs meanwhile, as in update_stage().
+    
+    Returns:
+        current_state, embedding, rest (awaitable of response, pcc_score, details)
+    """
+    # async with semaphore:
+    #     current_state, rest = await chain.astream_step(event)
+    
+    # Placeholder
+    current_state = {'S': 5.0, 'M_meaning': 5.0, 'M_strain': 5.0}
+    embedding = await embedding
+    rest = asyncio.get_running_loop().create_future()
+    rest.set_result(("[Generated response placeholder]", 0.85, {}))
+    return current_state, embedding, rest
+
+
+async def run_simple_experiment(persona_config_path, event_sequence, llm_provider,
+                                seed=204, max_concurrency=8, pipeline_depth=2,
+                                pcc_batch_size=8, fused_chain=False,
+                                semaphore=None):
     """
     Run simplified experiment demonstrating framework flow
     
+    Events flow through a three-stage pipeline connected by bounded
+    queues: S/M update -> response generation -> PCC/PDS/PCR. S/M
+    updates are cumulative, so stage 1 handles events strictly in
+    order, but it starts event i+1 while event i is still being scored,
+    overlapping their network waits. Items carry their event index, so
+    results are reported in event order. Stage 3 buffers responses and
+    scores up to pcc_batch_size of them per PCC prompt.
+    
+    With fused_chain, stages 1-3 collapse into one streamed call per
+    event (FusedChain: deltas, response and PCC in one JSON output); the
+    next event starts once the deltas have streamed in, and only
+    low-PCC responses take the extra PDS call.
+    
     Args:
         persona_config_path: Path to persona JSON config
         event_sequence: List of events to process
         llm_provider: LLM provider ("openai", "claude", "deepseek")
+        seed: Random seed of this run (Python/NumPy generators, semantic
+            cache exploration and the LLM sampling seed)
+        max_concurrency: Max in-flight LLM calls
+        pipeline_depth: Max events waiting between two stages
+        pcc_batch_size: Responses per PCC prompt (1 = one call per event)
+        fused_chain: One fused LLM call per event instead of three
+        semaphore: Shared in-flight call limit across concurrent runs
+            (overrides max_concurrency)
     
     Returns:
-        results: Dictionary with PCC scores and state trajectories
+        results: Dictionary with PCC scores (float32 [n_events]), their
+            L-gated flags (bool [n_events]) and the state trajectory
+            (STATE_DTYPE [n_events])
     """
     
+    # Seed the global generators; run_all() overlaps seeds in one
+    # process, so components also take the seed themselves
+    random.seed(seed)
+    np.random.seed(seed)
+    
     # Load persona configuration
-    with open(persona_config_path, 'r') as f:
-        persona_config = json.load(f)
+    persona_config = load_json(persona_config_path)
     
-    print(f"\nLoaded persona: {persona_config['name']}")
+    print(f"\nLoaded persona: {persona_config['name']} (seed {seed})")
     print(f"Innate traits: {persona_config['innate_traits']}")
     
     # Initialize components
@@ -65,71 +260,174 @@ def run_simple_experiment(persona_config_path, event_sequence, llm_provider):
     print("  - PDS Corrector")
     print("  - PCR Manager")
     
+    # semantic_cache = SemanticCache(
+    #     cache_dir="data/semantic_cache",
+    #     cache_key=(persona_config['name'], llm_provider, RUBRIC_VERSION),
+    #     seed=seed)
+    # llm_client = LLMClient(llm_provider, semantic_cache=semantic_cache,
+    #                        embedding_client=OpenAI(), seed=seed)
     # state_tracker = StateTracker(persona_config)
     # pcc = PCCEvaluator(llm_client, model="gpt-4o")
     # pcr = PCRManager()
     # pds = PDSCorrector(llm_client, pcr)
+    # chain = FusedChain(llm_client, state_tracker, pcc)
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(max_concurrency)
     
+    n_events = len(event_sequence)
     results = {
         'persona': persona_config['name'],
+        'seed': seed,
         'events_processed': 0,
-        'pcc_scores': [],
+        'pcc_scores': np.empty(n_events, dtype=np.float32),
+        'pcc_gated': np.zeros(n_events, dtype=bool),
         'pds_corrections': 0,
-        'state_trajectory': []
+        'state_trajectory': np.zeros(n_events, dtype=STATE_DTYPE)
     }
     
-    print(f"\nProcessing {len(event_sequence)} events...")
+    print(f"\nProcessing {n_events} events...")
     
-    for i, event in enumerate(event_sequence):
-        print(f"\n--- Event {i+1}/{len(event_sequence)} ---")
-        print(f"Event: {event[:80]}...")
-        
-        # Step 1: Update S/M based on event impact
-        # deltas = state_tracker.update_state(event, llm_client)
-        # current_state = state_tracker.get_current_state()
+    # None marks the end of the stream
+    state_q = asyncio.Queue(maxsize=pipeline_depth)
+    response_q = asyncio.Queue(maxsize=pipeline_depth)
+    
+    # Embeddings do not depend on S/M, so event i+1's is fetched in the
+    # background while event i waits on its LLM calls (one event ahead,
+    # through the shared semaphore, so prefetching cannot run away)
+    prefetch = {}
+    
+    def embedding_task(i):
+        for j in (i, i + 1):
+            if j < n_events and j not in prefetch:
+                prefetch[j] = asyncio.create_task(
+                    embed_stage(event_sequence[j], semaphore)
+                )
+        return prefetch.pop(i)
+    
+    async def state_worker():
+        for i, event in enumerate(event_sequence):
+            current_state, embedding = await update_stage(
+                event, embedding_task(i), semaphore
+            )
+            await state_q.put((i, event, current_state, embedding))
+        await state_q.put(None)
+    
+    async def response_worker():
+        while (item := await state_q.get()) is not None:
+            i, event, current_state, embedding = item
+            response = await respond_stage(event, current_state, semaphore)
+            await response_q.put((i, event, current_state, embedding, response))
+        await response_q.put(None)
+    
+    async def score_worker():
+        buffer = []
+        done = False
+        while not done:
+            item = await response_q.get()
+            done = item is None
+            if not done:
+                buffer.append(item)
+            # Flush when full, or at the end of the stream
+            if not buffer or (len(buffer) < pcc_batch_size and not done):
+                continue
+            
+            scored = await score_stage(
+                [item[1:] for item in buffer], semaphore, pcc_batch_size
+            )
+            for (i, event, current_state, _, _), outcome in zip(buffer, scored):
+                record(i, event, current_state, *outcome)
+            buffer = []
+    
+    async def chain_worker():
+        for i, event in enumerate(event_sequence):
+            current_state, embedding, rest = await chain_stage(
+                event, embedding_task(i), semaphore
+            )
+            await response_q.put((i, event, current_state, embedding, rest))
+        await response_q.put(None)
+    
+    async def correct_worker():
+        # Streams finish and low-PCC corrections run concurrently with
+        # the next fused calls
+        async def correct(i, event, current_state, embedding, rest):
+            response, pcc_score, details = await rest
+            outcome = await correct_stage(
+                (event, current_state, embedding, response), pcc_score,
+                details, semaphore
+            )
+            record(i, event, current_state, *outcome)
         
-        # Placeholder
-        current_state = {'S': 5.0, 'M_meaning': 5.0, 'M_strain': 5.0}
+        tasks = []
+        while (item := await response_q.get()) is not None:
+            tasks.append(asyncio.create_task(correct(*item)))
+        await asyncio.gather(*tasks)
+    
+    def record(i, event, current_state, response, pcc_score, corrected,
+               details):
+        gated = bool(details.get('gated'))
+        print(f"\n--- Event {i+1}/{n_events} ---")
+        print(f"Event: {event[:80]}...")
         print(f"State: S={current_state['S']:.1f}, M={current_state['M_meaning']:.1f}/{current_state['M_strain']:.1f}")
-        
-        # Step 2: Generate response conditioned on L + current S/M
-        # response = generate_response(persona_traits, current_state, event, llm_client)
-        
-        response = "[Generated response placeholder]"
         print(f"Response: {response[:60]}...")
-        
-        # Step 3: Evaluate with PCC
-        # pcc_score, details = pcc.evaluate(persona_traits, current_state, event, response)
-        
-        pcc_score = 0.85  # Placeholder
-        print(f"PCC Score: {pcc_score:.2f}")
-        
-        # Step 4: Correct if needed
-        # if pcc_score < 0.6:
-        #     response, corrected = pds.correct_if_needed(...)
-        #     if corrected:
-        #         results['pds_corrections'] += 1
-        
-        # Step 5: Add to PCR if high quality
-        # if pcc_score >= 0.85:
-        #     pcr.add_case(scene, event, response, current_state, pcc_score, embedding)
+        print(f"PCC Score: {pcc_score:.2f}" + (" (L-gated, upper bound)" if gated else ""))
         
         results['events_processed'] += 1
-        results['pcc_scores'].append(pcc_score)
-        results['state_trajectory'].append(current_state)
+        results['pcc_scores'][i] = pcc_score
+        results['pcc_gated'][i] = gated
+        results['pds_corrections'] += corrected
+        results['state_trajectory'][i] = (
+            current_state['S'], current_state['M_meaning'],
+            current_state['M_strain']
+        )
+    
+    if fused_chain:
+        await asyncio.gather(chain_worker(), correct_worker())
+    else:
+        await asyncio.gather(state_worker(), response_worker(), score_worker())
     
-    # Summary
-    avg_pcc = sum(results['pcc_scores']) / len(results['pcc_scores'])
+    # semantic_cache.close()  # snapshot: the next run starts warm
+    
+    # Summary: L-gated scores are upper bounds (S/M never assessed), so
+    # they are reported apart from the average of fully scored events
+    gated = results['pcc_gated']
+    scored = results['pcc_scores'][~gated]
+    avg_pcc = float(scored.mean()) if scored.size else float('nan')
     print(f"\n{'='*60}")
-    print(f"Experiment Complete")
+    print(f"Experiment Complete (seed {seed})")
     print(f"{'='*60}")
-    print(f"Average PCC: {avg_pcc:.4f}")
+    print(f"Average PCC: {avg_pcc:.4f} ({scored.size} fully scored events)")
+    if gated.any():
+        print(f"L-gated: {int(gated.sum())} events, "
+              f"PCC <= {results['pcc_scores'][gated].mean():.4f} on average")
     print(f"PDS Corrections: {results['pds_corrections']}")
     print(f"PCR Size: [Implementation dependent]")
     
     return results
 
 
+async def run_all(seeds, rpm=500, **kwargs):
+    """
+    Run one experiment per seed concurrently
+    
+    Seeds are independent, so their runs overlap; one semaphore shared
+    by all of them keeps in-flight calls within the provider budget
+    (rpm // 60 concurrent calls, i.e. about rpm at ~1 s per call).
+    
+    Args:
+        seeds: Random seeds
+        rpm: Provider requests-per-minute limit
+        **kwargs: Arguments of run_simple_experiment()
+    
+    Returns:
+        results per seed, in input order
+    """
+    semaphore = asyncio.Semaphore(max(1, rpm // 60))
+    return await asyncio.gather(*(
+        run_simple_experiment(seed=seed, semaphore=semaphore, **kwargs)
+        for seed in seeds
+    ))
+
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Run P³ Framework Experiment")
     parser.add_argument("--persona", type=str, default="lisa_chen",
@@ -138,8 +436,15 @@ if __name__ == "__main__":
                         help="LLM provider (gpt-4o, claude, deepseek)")
     parser.add_argument("--seeds", type=str, default="204",
                         help="Comma-separated random seeds")
+    parser.add_argument("--rpm", type=int, default=500,
+                        help="Provider requests-per-minute limit")
+    parser.add_argument("--fused-chain", action="store_true",
+                        help="One LLM call per event for state/response/PCC")
+    parser.add_argument("--output", type=str, default=None,
+                        help="Write per-seed results to this JSON file")
     
     args = parser.parse_args()
+    seeds = [int(s) for s in args.seeds.split(",")]
     
     # Example event sequence (simplified)
     example_events = [
@@ -155,15 +460,20 @@ if __name__ == "__main__":
     print(f"\nConfiguration:")
     print(f"  Persona: {args.persona}")
     print(f"  Model: {args.model}")
-    print(f"  Seeds: {args.seeds}")
+    print(f"  Seeds: {seeds}")
     print(f"\nNote: This is a simplified demonstration.")
     print(f"      For complete experimental protocol, see paper Section 5.1\n")
     
-    results = run_simple_experiment(
+    results = asyncio.run(run_all(
+        seeds,
+        rpm=args.rpm,
         persona_config_path=persona_config_path,
         event_sequence=example_events,
-        llm_provider=args.model
-    )
+        llm_provider=args.model,
+        fused_chain=args.fused_chain
+    ))
     
-    print(f"\n✓ Results saved (not implemented in demo)")
+    if args.output:
+        dump_results(results, args.output)
+        print(f"\n✓ Results saved to {args.output}")
     print(f"  See paper Table 1 for complete experimental results")
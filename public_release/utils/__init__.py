@@ -2,6 +2,20 @@
 Utility functions for P³ Framework
 """
 
-from .llm_interface import LLMClient, get_embedding
+from .llm_interface import LLMClient, get_embedding, get_embeddings
+from .llm_cache import LLMCache
+from .semantic_cache import SemanticCache
+from .embedding_batcher import EmbeddingBatcher
+from .json_stream import JSONFieldStream
+from .rate_limiter import TokenBucket
 
-__all__ = ["LLMClient", "get_embedding"]
+__all__ = [
+    "LLMClient",
+    "get_embedding",
+    "get_embeddings",
+    "LLMCache",
+    "SemanticCache",
+    "EmbeddingBatcher",
+    "JSONFieldStream",
+    "TokenBucket",
+]
@@ -0,0 +1,116 @@
+"""
+Embedding Request Coalescing
+
+Concurrent coroutines that each need one embedding (PCR lookups of
+pipelined events, prefetches) would each pay a round trip. The batcher
+collects requests arriving within a short window and sends them as one
+multi-input embeddings request.
+
+Note: max_wait trades latency for batching - a lone request waits up to
+max_wait before it is sent; under load, batches fill to max_batch and go
+out immediately.
+"""
+
+import asyncio
+import numpy as np
+from typing import List, Optional
+
+
+class EmbeddingBatcher:
+    """
+    Coalesces concurrent embedding requests into batched API calls
+
+    submit() enqueues (text, future); a background task takes the first
+    pending request, keeps collecting until max_batch requests or
+    max_wait seconds have passed, issues one request for all of them and
+    resolves each future with its row.
+    """
+
+    def __init__(self, client=None, model: str = "text-embedding-ada-002",
+                 max_batch: int = 256, max_wait: float = 0.02,
+                 dim: int = 1536):
+        """
+        Args:
+            client: Async OpenAI-compatible client exposing
+                embeddings.create (None = zero-vector placeholder)
+            model: Embedding model
+            max_batch: Max texts per request
+            max_wait: Seconds to wait for more texts after the first
+            dim: Embedding dimension
+        """
+        self.client = client
+        self.model = model
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.dim = dim
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+
+    async def submit(self, text: str) -> np.ndarray:
+        """Embedding of one text (float32 [dim]), batched with concurrent calls"""
+        loop = asyncio.get_running_loop()
+        # (Re)start the worker on first use and when used from a new loop
+        if self._worker is None or self._worker.get_loop() is not loop:
+            self._queue = asyncio.Queue()
+            self._worker = loop.create_task(self._run())
+
+        future = loop.create_future()
+        await self._queue.put((text, future))
+        return await future
+
+    async def aclose(self):
+        """Stop the background task (pending requests are cancelled)"""
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+
+        while self._queue is not None and not self._queue.empty():
+            _, future = self._queue.get_nowait()
+            future.cancel()
+
+    async def _run(self):
+        """Collect a batch per window and resolve its futures"""
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(
+                        await asyncio.wait_for(self._queue.get(), timeout)
+                    )
+                except asyncio.TimeoutError:
+                    break
+
+            try:
+                vectors = await self._embed([text for text, _ in batch])
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            for (_, future), vec in zip(batch, vectors):
+                if not future.done():
+                    future.set_result(vec)
+
+    async def _embed(self, texts: List[str]) -> np.ndarray:
+        """One embeddings request for all texts"""
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        if self.client is None:
+            # Placeholder - configure client for real embeddings
+            return vectors
+
+        result = await self.client.embeddings.create(input=texts,
+                                                     model=self.model)
+        data = sorted(result.data, key=lambda d: d.index)
+        vectors[:] = [d.embedding for d in data]
+        return vectors
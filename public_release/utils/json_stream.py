@@ -0,0 +1,83 @@
+"""
+Incremental JSON Field Parser
+
+Streamed completions arrive as text chunks. For a JSON object output
+(e.g. the fused chain's {"deltas", "response", "pcc"}), each top-level
+field can be used as soon as its value is closed, without waiting for
+the rest of the object.
+
+Note: Only top-level fields are emitted, each parsed on its own once
+complete; malformed fields are skipped (callers still parse the full
+text at the end for their fallbacks).
+"""
+
+import json
+from typing import Any, List, Tuple
+
+
+class JSONFieldStream:
+    """
+    Emits the top-level (key, value) pairs of one streamed JSON object
+
+    feed() scans only the new characters, tracking nesting depth and
+    string/escape state. A member ends at a depth-1 comma or at the
+    closing brace; its text is then parsed by itself. Text before the
+    opening brace (e.g. a markdown fence) is ignored.
+    """
+
+    def __init__(self):
+        self._text = ""
+        self._pos = 0          # next character to scan
+        self._start = None     # start of the current member's text
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._closed = False
+
+    def feed(self, chunk: str) -> List[Tuple[str, Any]]:
+        """
+        Add a chunk of streamed text
+
+        Returns:
+            (key, value) of the top-level fields completed by this chunk
+        """
+        self._text += chunk
+        text = self._text
+        fields = []
+        for pos in range(self._pos, len(text)):
+            c = text[pos]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif c == '\\':
+                    self._escape = True
+                elif c == '"':
+                    self._in_string = False
+            elif self._depth == 0:
+                if c == '{' and not self._closed:
+                    self._depth = 1
+                    self._start = pos + 1
+            elif c == '"':
+                self._in_string = True
+            elif c in '{[':
+                self._depth += 1
+            elif c in '}]':
+                self._depth -= 1
+                if self._depth == 0:
+                    fields.extend(self._member(text[self._start:pos]))
+                    self._closed = True
+            elif c == ',' and self._depth == 1:
+                fields.extend(self._member(text[self._start:pos]))
+                self._start = pos + 1
+        self._pos = len(text)
+        return fields
+
+    @staticmethod
+    def _member(text: str) -> List[Tuple[str, Any]]:
+        """Parse one `"key": value` member ([] if blank or malformed)"""
+        if not text.strip():
+            return []
+        try:
+            return list(json.loads("{" + text + "}").items())
+        except json.JSONDecodeError:
+            return []
@@ -0,0 +1,129 @@
+"""
+LLM Response Cache - Deterministic Call Reuse
+
+PCC scoring and S/M impact assessment run at low temperature and are
+re-issued verbatim across re-evaluations and ablations. This module
+caches their completions by content hash so repeated runs skip the API.
+
+LLMClient uses an LLMCache as its exact-match tier (in memory by
+default); core.CachedLLMClient plugs a persistent one into any client.
+
+Note: Only calls at or below `max_temperature` are cached; sampling
+calls (e.g. PDS rewrites at 0.7) always go to the provider.
+"""
+
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional
+
+
+class LLMCache:
+    """
+    Content-addressed completion cache (memory + optional SQLite on disk)
+
+    The memory tier is an LRU bounded by max_entries; with a path, every
+    entry is also kept in SQLite and reloaded into memory on access.
+
+    Key = sha256(json.dumps({model, prompt, temperature, max_tokens, ...}))
+    Entry = {"result": str, "ts": int}
+    """
+
+    def __init__(self, path: Optional[str] = None, ttl: Optional[int] = None,
+                 max_temperature: float = 0.3,
+                 max_entries: Optional[int] = None):
+        """
+        Initialize cache
+
+        Args:
+            path: SQLite file for persistence across runs (None = memory only)
+            ttl: Entry lifetime in seconds (None = never expires)
+            max_temperature: Highest temperature whose calls are cached
+            max_entries: Max completions kept in memory (None = unbounded)
+        """
+        self.path = path
+        self.ttl = ttl
+        self.max_temperature = max_temperature
+        self.max_entries = max_entries
+
+        self._memory: Dict[str, Dict] = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        if path is not None:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache "
+                "(key TEXT PRIMARY KEY, result TEXT, ts INTEGER)"
+            )
+            self._db.commit()
+
+    def cacheable(self, temperature: float) -> bool:
+        """Whether a call at this temperature is deterministic enough to cache"""
+        return temperature <= self.max_temperature
+
+    @staticmethod
+    def make_key(model: Optional[str], prompt: str, temperature: float,
+                 max_tokens: int, **options) -> str:
+        """
+        Content hash identifying one LLM call
+
+        Extra generation options (e.g. response_format) are part of the
+        key when given, since they change the completion.
+        """
+        fields = {
+            'model': model,
+            'prompt': prompt,
+            'temperature': temperature,
+            'max_tokens': max_tokens
+        }
+        fields.update({k: v for k, v in options.items() if v is not None})
+        payload = json.dumps(fields, sort_keys=True)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """Return cached completion, or None on miss/expiry"""
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+            elif self._db is not None:
+                row = self._db.execute(
+                    "SELECT result, ts FROM llm_cache WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    entry = {'result': row[0], 'ts': row[1]}
+                    self._remember(key, entry)
+
+        if entry is None:
+            return None
+        if self.ttl is not None and time.time() - entry['ts'] > self.ttl:
+            return None
+        return entry['result']
+
+    def set(self, key: str, result: str):
+        """Store a completion"""
+        entry = {'result': result, 'ts': int(time.time())}
+        with self._lock:
+            self._remember(key, entry)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO llm_cache VALUES (?, ?, ?)",
+                    (key, entry['result'], entry['ts'])
+                )
+                self._db.commit()
+
+    def _remember(self, key, entry):
+        """Insert into the memory tier, evicting the least recently used"""
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        if self.max_entries is not None and len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def close(self):
+        """Close the on-disk store"""
+        if self._db is not None:
+            self._db.close()
+            self._db = None
@@ -6,7 +6,43 @@ Simplified version for demonstration.
 """
 
 import os
-from typing import Optional
+import json
+import time
+import random
+import asyncio
+import importlib.util
+import numpy as np
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from .llm_cache import LLMCache
+from .semantic_cache import SemanticCache
+from .embedding_batcher import EmbeddingBatcher
+from .prompt_builder import build, anthropic_system
+from .rate_limiter import TokenBucket
+
+
+# DeepSeek exposes an OpenAI-compatible chat completions endpoint
+DEEPSEEK_BASE_URL = "https://api.deepseek.com"
+
+# Connection pool of the shared async HTTP client
+MAX_CONNECTIONS = 128
+MAX_KEEPALIVE_CONNECTIONS = 64
+
+# Request timeout and connect timeout (seconds)
+HTTP_TIMEOUT = 60.0
+CONNECT_TIMEOUT = 5.0
+
+# Event/prompt embedding dimension (text-embedding-ada-002)
+EMBEDDING_DIM = 1536
+
+# Attempts per call when the provider answers 429, and the exponential
+# backoff (seconds) used when it sends no Retry-After header
+RATE_LIMIT_ATTEMPTS = 6
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 60.0
+
+# Rough prompt size estimate for the TPM bucket before usage is known
+CHARS_PER_TOKEN = 4
 
 
 class LLMClient:
@@ -16,48 +52,486 @@ class LLMClient:
     Supported: OpenAI, Anthropic, DeepSeek
     """
     
-    def __init__(self, provider: str = "openai", model: str = "gpt-4o"):
+    def __init__(self, provider: str = "openai", model: str = "gpt-4o",
+                 semantic_cache: Optional[SemanticCache] = None,
+                 embedding_client=None, aembedding_client=None,
+                 embed_model: str = "text-embedding-ada-002",
+                 exact_cache: Optional[LLMCache] = None,
+                 exact_cache_size: int = 10000,
+                 exact_cache_max_temperature: float = 0.3,
+                 rpm: Optional[int] = None, tpm: Optional[int] = None,
+                 seed: Optional[int] = None):
         """
         Initialize LLM client
         
         Args:
             provider: "openai", "claude", or "deepseek"
             model: Model name
+            semantic_cache: Serve near-duplicate low-temperature prompts
+                from earlier completions (None = always call the provider)
+            embedding_client: OpenAI-compatible client exposing
+                embeddings.create, embedding prompts for the semantic
+                cache in generate() (None = semantic cache not consulted)
+            aembedding_client: Async counterpart used by agenerate() and
+                aget_embedding() (None = this client's AsyncOpenAI when
+                the provider is OpenAI)
+            embed_model: Embedding model of the semantic cache
+            exact_cache: Exact-match tier for verbatim repeats (e.g. a
+                persistent LLMCache); default: an in-memory LLMCache
+                built from the two settings below
+            exact_cache_size: Max completions kept in the default tier
+                (0 = no exact-match cache)
+            exact_cache_max_temperature: Highest temperature whose calls
+                the default tier caches
+            rpm: Provider requests-per-minute limit of the account tier;
+                async calls are paced below it (None = unthrottled)
+            tpm: Provider tokens-per-minute limit (None = unthrottled)
+            seed: Sampling seed sent with OpenAI requests (best-effort
+                determinism; other providers have no such option)
         """
         self.provider = provider
         self.model = model
+        self.semantic_cache = semantic_cache
+        self.embedding_client = embedding_client
+        self.aembedding_client = aembedding_client
+        self.embed_model = embed_model
+        self.seed = seed
+        
+        # Exact-match tier, checked before the semantic cache so verbatim
+        # repeats cost neither an embedding nor a call
+        if exact_cache is None and exact_cache_size > 0:
+            exact_cache = LLMCache(max_temperature=exact_cache_max_temperature,
+                                   max_entries=exact_cache_size)
+        self.exact_cache = exact_cache
+        self._stats = {'exact_hits': 0, 'semantic_hits': 0, 'misses': 0}
         
         # Load API keys from environment
         self.api_key = self._load_api_key(provider)
         
         # Initialize client (simplified)
         self.client = None  # Placeholder - actual implementation initializes provider-specific client
+        
+        # Async provider client and the pooled HTTP client under it,
+        # built on first use and reused (keep-alive); see aclose()
+        self._aclient = None
+        self._http = None
+        self._embedding_batchers: Dict[str, EmbeddingBatcher] = {}
+        
+        # Token buckets pacing async calls below the provider's limits
+        self._rpm = TokenBucket(rpm) if rpm else None
+        self._tpm = TokenBucket(tpm) if tpm else None
     
-    def generate(self, prompt: str, temperature: float = 0.7,
-                 max_tokens: int = 500) -> str:
+    def generate(self, prompt: str, model: Optional[str] = None,
+                 temperature: float = 0.7, max_tokens: int = 500,
+                 response_format: Optional[Dict] = None,
+                 system_prefix: Optional[str] = None) -> str:
         """
         Generate response from LLM
         
         Args:
             prompt: Input prompt
+            model: Model override for this call (defaults to self.model)
             temperature: Sampling temperature
             max_tokens: Maximum response length
+            response_format: OpenAI-style structured output spec, e.g.
+                {"type": "json_object"} or {"type": "json_schema", ...}
+            system_prefix: Static prompt prefix sent as the system
+                message ahead of `prompt` (see utils.prompt_builder);
+                providers serve it from their prompt cache
         
         Returns:
             Generated text
         """
+        model = model or self.model
+        key = self._exact_key(prompt, model, temperature, max_tokens,
+                              response_format, system_prefix)
+        result = self._exact_get(key)
+        if result is not None:
+            return result
+        
+        cache = self._semantic_cache(temperature)
+        if cache is None:
+            result = self._dispatch(prompt, model, temperature, max_tokens,
+                                    response_format, system_prefix)
+            self._stats['misses'] += 1
+        else:
+            namespace = cache.namespace(model, response_format, system_prefix)
+            embedding = self._embed(prompt)
+            result, row, sim, explored = cache.match(embedding, namespace)
+            if result is None:
+                result = self._dispatch(prompt, model, temperature,
+                                        max_tokens, response_format,
+                                        system_prefix)
+                self._stats['misses'] += 1
+                self._cache_result(embedding, prompt, result, namespace,
+                                   row, sim, explored)
+            else:
+                self._stats['semantic_hits'] += 1
+        
+        self._exact_set(key, result)
+        return result
+    
+    def cache_stats(self) -> Tuple[int, int, int]:
+        """(exact_hits, semantic_hits, misses) over this client's calls"""
+        return (self._stats['exact_hits'], self._stats['semantic_hits'],
+                self._stats['misses'])
+    
+    def _semantic_cache(self, temperature, asynchronous=False):
+        """
+        Semantic cache for a call, or None
+        
+        Sampling calls are not cached, and without an embedding client
+        every prompt would embed to the zero placeholder, which the
+        cache neither stores nor matches.
+        """
+        cache = self.semantic_cache
+        if asynchronous:
+            can_embed = (self.aembedding_client is not None
+                         or self.provider == "openai")
+        else:
+            can_embed = self.embedding_client is not None
+        if cache is None or not can_embed or not cache.cacheable(temperature):
+            return None
+        return cache
+    
+    def _embed(self, prompt):
+        """Prompt embedding for the semantic cache"""
+        return get_embeddings([prompt], client=self.embedding_client,
+                              model=self.embed_model)[0]
+    
+    def _exact_key(self, prompt, model, temperature, max_tokens,
+                   response_format, system_prefix=None):
+        """LLMCache key of a call (None if not cacheable verbatim)"""
+        cache = self.exact_cache
+        if cache is None or not cache.cacheable(temperature):
+            return None
+        return cache.make_key(model, prompt, temperature, max_tokens,
+                              response_format=response_format,
+                              system_prefix=system_prefix)
+    
+    def _exact_get(self, key):
+        """Completion of a verbatim repeat, or None"""
+        if key is None:
+            return None
+        result = self.exact_cache.get(key)
+        if result is not None:
+            self._stats['exact_hits'] += 1
+        return result
+    
+    def _exact_set(self, key, result):
+        """Remember a completion in the exact-match tier"""
+        if key is not None:
+            self.exact_cache.set(key, result)
+    
+    def _cache_result(self, embedding, prompt, result, namespace,
+                      row, sim, explored):
+        """
+        Store a fresh completion in the semantic cache
+        
+        The nearest entry found by SemanticCache.match() is labelled by
+        the fresh completion (agreeing answer = it would have been a
+        correct hit, see SemanticCache.agrees), which tunes its
+        threshold: near misses let it fall, wrong explored hits push it
+        up. An explored hit's completion is not added, the entry
+        already covers the prompt.
+        """
+        cache = self.semantic_cache
+        if row is not None:
+            cache.observe(row, sim, cache.agrees(row, result))
+        if not explored:
+            cache.add(embedding, prompt, result, namespace)
+    
+    def _dispatch(self, prompt, model, temperature, max_tokens,
+                  response_format, system_prefix=None):
+        """Send one generate() call to the configured provider"""
         # Placeholder implementation
         # Actual code calls provider-specific API
-        
         if self.provider == "openai":
-            return self._call_openai(prompt, temperature, max_tokens)
+            return self._call_openai(prompt, model, temperature, max_tokens,
+                                     response_format, system_prefix)
         elif self.provider == "claude":
-            return self._call_claude(prompt, temperature, max_tokens)
+            return self._call_claude(prompt, model, temperature, max_tokens,
+                                     response_format, system_prefix)
         elif self.provider == "deepseek":
-            return self._call_deepseek(prompt, temperature, max_tokens)
+            return self._call_deepseek(prompt, model, temperature, max_tokens,
+                                       response_format, system_prefix)
         else:
             raise ValueError(f"Unsupported provider: {self.provider}")
     
+    async def agenerate(self, prompt: str, model: Optional[str] = None,
+                        temperature: float = 0.7, max_tokens: int = 500,
+                        response_format: Optional[Dict] = None,
+                        system_prefix: Optional[str] = None) -> str:
+        """
+        Coroutine version of generate()
+        
+        Awaits the provider's native async client (AsyncOpenAI,
+        AsyncAnthropic, httpx for DeepSeek), so independent calls issued
+        with asyncio.gather overlap their network waits without threads.
+        """
+        model = model or self.model
+        key = self._exact_key(prompt, model, temperature, max_tokens,
+                              response_format, system_prefix)
+        result = self._exact_get(key)
+        if result is not None:
+            return result
+        
+        cache = self._semantic_cache(temperature, asynchronous=True)
+        if cache is None:
+            result = await self._adispatch(prompt, model, temperature,
+                                           max_tokens, response_format,
+                                           system_prefix)
+            self._stats['misses'] += 1
+        else:
+            namespace = cache.namespace(model, response_format, system_prefix)
+            embedding = await self.aget_embedding(prompt, self.embed_model)
+            result, row, sim, explored = cache.match(embedding, namespace)
+            if result is None:
+                result = await self._adispatch(prompt, model, temperature,
+                                               max_tokens, response_format,
+                                               system_prefix)
+                self._stats['misses'] += 1
+                self._cache_result(embedding, prompt, result, namespace,
+                                   row, sim, explored)
+            else:
+                self._stats['semantic_hits'] += 1
+        
+        self._exact_set(key, result)
+        return result
+    
+    async def _adispatch(self, prompt, model, temperature, max_tokens,
+                         response_format, system_prefix=None):
+        """
+        Send one agenerate() call to the configured provider
+        
+        Waits for the RPM/TPM buckets first. A 429 is retried after the
+        provider's Retry-After delay, or an exponential backoff with
+        jitter; the TPM estimate is corrected by the reported usage.
+        """
+        call = self._provider_method("_acall")
+        estimate = self._estimate_tokens(prompt, system_prefix, max_tokens)
+        for attempt in range(RATE_LIMIT_ATTEMPTS):
+            await self._throttle(estimate)
+            try:
+                result, used = await call(prompt, model, temperature,
+                                          max_tokens, response_format,
+                                          system_prefix)
+            except Exception as e:
+                delay = self._retry_delay(e, attempt, estimate)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+                continue
+            
+            if self._tpm is not None and used is not None:
+                self._tpm.adjust(estimate - used)
+            return result
+    
+    async def astream(self, prompt: str, model: Optional[str] = None,
+                      temperature: float = 0.7, max_tokens: int = 500,
+                      response_format: Optional[Dict] = None,
+                      system_prefix: Optional[str] = None) -> AsyncIterator[str]:
+        """
+        Streaming version of agenerate(): yields text chunks as they arrive
+        
+        Lets callers act on a prefix of the output (e.g. parse completed
+        JSON fields with utils.JSONFieldStream) while the rest is still
+        being generated. A verbatim repeat is served from the exact-match
+        cache as a single chunk; the semantic cache is not consulted,
+        since its lookup would delay the first chunk by an embedding call.
+        """
+        model = model or self.model
+        key = self._exact_key(prompt, model, temperature, max_tokens,
+                              response_format, system_prefix)
+        result = self._exact_get(key)
+        if result is not None:
+            yield result
+            return
+        
+        # Throttled like agenerate(); a 429 is retried only before the
+        # first chunk (the TPM estimate is not corrected for streams)
+        stream = self._provider_method("_astream")
+        estimate = self._estimate_tokens(prompt, system_prefix, max_tokens)
+        chunks = []
+        for attempt in range(RATE_LIMIT_ATTEMPTS):
+            await self._throttle(estimate)
+            try:
+                async for chunk in stream(prompt, model, temperature,
+                                          max_tokens, response_format,
+                                          system_prefix):
+                    chunks.append(chunk)
+                    yield chunk
+            except Exception as e:
+                delay = None if chunks else self._retry_delay(e, attempt,
+                                                              estimate)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+                continue
+            break
+        
+        self._stats['misses'] += 1
+        self._exact_set(key, "".join(chunks))
+    
+    def _provider_method(self, kind):
+        """Bound provider implementation of a kind, e.g. _acall -> _acall_openai"""
+        if self.provider not in ("openai", "claude", "deepseek"):
+            raise ValueError(f"Unsupported provider: {self.provider}")
+        return getattr(self, f"{kind}_{self.provider}")
+    
+    @staticmethod
+    def _estimate_tokens(prompt, system_prefix, max_tokens):
+        """Upper-bound token estimate of a call before its usage is known"""
+        chars = len(prompt) + len(system_prefix or "")
+        return chars // CHARS_PER_TOKEN + max_tokens
+    
+    async def _throttle(self, tokens):
+        """Wait for one request and `tokens` tokens of provider budget"""
+        if self._rpm is not None:
+            await self._rpm.acquire()
+        if self._tpm is not None:
+            await self._tpm.acquire(tokens)
+    
+    def _retry_delay(self, error, attempt, tokens):
+        """
+        Seconds to wait before retrying a rate-limited call, or None
+        
+        Only 429 responses are retried (SDK clients are built with
+        max_retries=0, so retries are not stacked). The provider's
+        Retry-After wins; otherwise full-jitter exponential backoff.
+        """
+        response = getattr(error, "response", None)
+        if (getattr(response, "status_code", None) != 429
+                or attempt + 1 >= RATE_LIMIT_ATTEMPTS):
+            return None
+        
+        # The rejected request consumed no tokens
+        if self._tpm is not None:
+            self._tpm.adjust(tokens)
+        
+        try:
+            return float(response.headers["retry-after"])
+        except (KeyError, TypeError, ValueError):
+            return random.uniform(0, min(BACKOFF_MAX,
+                                         BACKOFF_BASE * 2 ** attempt))
+    
+    async def aget_embedding(self, text: str,
+                             model: str = "text-embedding-ada-002") -> np.ndarray:
+        """
+        Coroutine version of get_embedding() via the async OpenAI client
+        
+        Requests from concurrent coroutines are coalesced into batched
+        embeddings calls (EmbeddingBatcher, 20 ms window). Only OpenAI
+        serves embeddings among the supported providers; other providers
+        need an aembedding_client.
+        
+        Returns:
+            float32 [EMBEDDING_DIM]
+        """
+        client = self.aembedding_client
+        if client is None:
+            if self.provider != "openai":
+                raise ValueError(f"Embeddings not supported for provider: {self.provider}")
+            client = self._get_aclient()
+        
+        # One batcher per model: requests in flight for another model
+        # keep their batcher (and their pending futures)
+        batcher = self._embedding_batchers.get(model)
+        if batcher is None:
+            batcher = self._embedding_batchers[model] = EmbeddingBatcher(
+                client=client, model=model, dim=EMBEDDING_DIM
+            )
+        return await batcher.submit(text)
+    
+    def generate_batch(self, prompts: List[str], model: Optional[str] = None,
+                       temperature: float = 0.7, max_tokens: int = 500,
+                       response_format: Optional[Dict] = None,
+                       poll_interval: float = 30.0,
+                       system_prefixes: Optional[List[Optional[str]]] = None
+                       ) -> List[Optional[str]]:
+        """
+        Generate responses for many prompts via the OpenAI Batch API
+        
+        For offline jobs that tolerate up to 24h latency (ablations,
+        full-test-set re-scoring): half the per-token cost and no
+        per-request round trip. Blocks until the batch finishes.
+        
+        Args:
+            prompts: Input prompts
+            model: Model override (defaults to self.model)
+            temperature: Sampling temperature
+            max_tokens: Maximum response length
+            response_format: OpenAI-style structured output spec
+            poll_interval: Seconds between batch status checks
+            system_prefixes: Static prompt prefix per prompt (see
+                generate()); None = no system messages
+        
+        Returns:
+            Generated text per prompt, in input order (None if that
+            request failed)
+        """
+        if self.provider != "openai":
+            raise ValueError(f"Batch API not supported for provider: {self.provider}")
+        
+        from openai import OpenAI
+        client = OpenAI(api_key=self.api_key)
+        model = model or self.model
+        
+        body = {
+            "model": model,
+            "temperature": temperature,
+            "max_tokens": max_tokens
+        }
+        if response_format is not None:
+            body["response_format"] = response_format
+        if self.seed is not None:
+            body["seed"] = self.seed
+        
+        if system_prefixes is None:
+            system_prefixes = [None] * len(prompts)
+        
+        # One chat-completion request per line; custom_id restores order
+        lines = [
+            json.dumps({
+                "custom_id": f"request-{i}",
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": {
+                    **body,
+                    "messages": build(system_prefix, prompt)
+                }
+            })
+            for i, (prompt, system_prefix) in enumerate(zip(prompts,
+                                                            system_prefixes))
+        ]
+        batch_file = client.files.create(
+            file=("batch.jsonl", "\n".join(lines).encode("utf-8")),
+            purpose="batch"
+        )
+        batch = client.batches.create(
+            input_file_id=batch_file.id,
+            endpoint="/v1/chat/completions",
+            completion_window="24h"
+        )
+        
+        while batch.status not in ("completed", "failed", "expired", "cancelled"):
+            time.sleep(poll_interval)
+            batch = client.batches.retrieve(batch.id)
+        
+        if batch.status != "completed":
+            raise RuntimeError(f"Batch {batch.id} ended with status: {batch.status}")
+        
+        results = [None] * len(prompts)
+        output = client.files.content(batch.output_file_id).text
+        for line in output.splitlines():
+            record = json.loads(line)
+            response = record.get("response") or {}
+            if record.get("error") is None and response.get("status_code") == 200:
+                index = int(record["custom_id"].rsplit("-", 1)[1])
+                results[index] = response["body"]["choices"][0]["message"]["content"]
+        
+        return results
+    
     def _load_api_key(self, provider: str) -> Optional[str]:
         """
         Load API key from environment
@@ -78,20 +552,251 @@ class LLMClient:
             return os.getenv(env_var)
         return None
     
-    def _call_openai(self, prompt, temperature, max_tokens):
+    def _call_openai(self, prompt, model, temperature, max_tokens,
+                     response_format=None, system_prefix=None):
         """Call OpenAI API - Implementation placeholder"""
         raise NotImplementedError("See paper Section 5.1 for API configuration")
     
-    def _call_claude(self, prompt, temperature, max_tokens):
+    def _call_claude(self, prompt, model, temperature, max_tokens,
+                     response_format=None, system_prefix=None):
         """Call Anthropic API - Implementation placeholder"""
         raise NotImplementedError("See paper Section 5.1 for API configuration")
     
-    def _call_deepseek(self, prompt, temperature, max_tokens):
+    def _call_deepseek(self, prompt, model, temperature, max_tokens,
+                       response_format=None, system_prefix=None):
         """Call DeepSeek API - Implementation placeholder"""
         raise NotImplementedError("See paper Section 5.1 for API configuration")
+    
+    async def aclose(self):
+        """Close the async clients and their connection pool"""
+        for batcher in self._embedding_batchers.values():
+            await batcher.aclose()
+        self._embedding_batchers.clear()
+        if self._aclient is not None:
+            await self._aclient.close()
+            self._aclient = None
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+    
+    def _get_http(self):
+        """
+        Shared httpx.AsyncClient (created once)
+        
+        One long-lived pool for all async provider calls: connections
+        (and TLS sessions) are reused, and with HTTP/2 concurrent
+        requests are multiplexed over them.
+        """
+        if self._http is None:
+            import httpx
+            self._http = httpx.AsyncClient(
+                # HTTP/2 needs the optional h2 package
+                http2=importlib.util.find_spec("h2") is not None,
+                limits=httpx.Limits(
+                    max_connections=MAX_CONNECTIONS,
+                    max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS
+                ),
+                timeout=httpx.Timeout(HTTP_TIMEOUT, connect=CONNECT_TIMEOUT)
+            )
+        return self._http
+    
+    def _get_aclient(self):
+        """Async SDK client for OpenAI/Anthropic on the shared pool (created once)"""
+        if self._aclient is None:
+            if self.provider == "openai":
+                from openai import AsyncOpenAI
+                self._aclient = AsyncOpenAI(api_key=self.api_key,
+                                            http_client=self._get_http(),
+                                            max_retries=0)
+            elif self.provider == "claude":
+                from anthropic import AsyncAnthropic
+                self._aclient = AsyncAnthropic(api_key=self.api_key,
+                                               http_client=self._get_http(),
+                                               max_retries=0)
+            else:
+                raise ValueError(f"No SDK client for provider: {self.provider}")
+        return self._aclient
+    
+    async def _acall_openai(self, prompt, model, temperature, max_tokens,
+                            response_format=None, system_prefix=None):
+        """Call OpenAI chat completions asynchronously: (text, total tokens)"""
+        options = {}
+        if response_format is not None:
+            options["response_format"] = response_format
+        if self.seed is not None:
+            options["seed"] = self.seed
+        
+        completion = await self._get_aclient().chat.completions.create(
+            model=model,
+            messages=build(system_prefix, prompt),
+            temperature=temperature,
+            max_tokens=max_tokens,
+            **options
+        )
+        usage = completion.usage
+        return (completion.choices[0].message.content,
+                usage.total_tokens if usage else None)
+    
+    async def _astream_openai(self, prompt, model, temperature, max_tokens,
+                              response_format=None, system_prefix=None):
+        """Stream OpenAI chat completion deltas"""
+        options = {}
+        if response_format is not None:
+            options["response_format"] = response_format
+        if self.seed is not None:
+            options["seed"] = self.seed
+        
+        stream = await self._get_aclient().chat.completions.create(
+            model=model,
+            messages=build(system_prefix, prompt),
+            temperature=temperature,
+            max_tokens=max_tokens,
+            stream=True,
+            **options
+        )
+        async for event in stream:
+            if event.choices and event.choices[0].delta.content:
+                yield event.choices[0].delta.content
+    
+    async def _acall_claude(self, prompt, model, temperature, max_tokens,
+                            response_format=None, system_prefix=None):
+        """
+        Call Anthropic messages asynchronously: (text, total tokens)
+        
+        The Messages API has no response_format; JSON output is requested
+        by the prompt itself. The system prefix carries a cache_control
+        breakpoint, so later calls with the same prefix read it from
+        Anthropic's prompt cache.
+        """
+        options = {}
+        if system_prefix:
+            options["system"] = anthropic_system(system_prefix)
+        
+        message = await self._get_aclient().messages.create(
+            model=model,
+            messages=[{"role": "user", "content": prompt}],
+            temperature=temperature,
+            max_tokens=max_tokens,
+            **options
+        )
+        text = "".join(
+            block.text for block in message.content if block.type == "text"
+        )
+        return text, message.usage.input_tokens + message.usage.output_tokens
+    
+    async def _astream_claude(self, prompt, model, temperature, max_tokens,
+                              response_format=None, system_prefix=None):
+        """Stream Anthropic message text deltas"""
+        options = {}
+        if system_prefix:
+            options["system"] = anthropic_system(system_prefix)
+        
+        async with self._get_aclient().messages.stream(
+            model=model,
+            messages=[{"role": "user", "content": prompt}],
+            temperature=temperature,
+            max_tokens=max_tokens,
+            **options
+        ) as stream:
+            async for text in stream.text_stream:
+                yield text
+    
+    async def _acall_deepseek(self, prompt, model, temperature, max_tokens,
+                              response_format=None, system_prefix=None):
+        """Call DeepSeek asynchronously (httpx): (text, total tokens)"""
+        response = await self._get_http().post(
+            f"{DEEPSEEK_BASE_URL}/chat/completions",
+            json=self._deepseek_payload(prompt, model, temperature,
+                                        max_tokens, response_format,
+                                        system_prefix),
+            headers={"Authorization": f"Bearer {self.api_key}"}
+        )
+        response.raise_for_status()
+        data = response.json()
+        return (data["choices"][0]["message"]["content"],
+                data.get("usage", {}).get("total_tokens"))
+    
+    async def _astream_deepseek(self, prompt, model, temperature, max_tokens,
+                                response_format=None, system_prefix=None):
+        """Stream DeepSeek chat completion deltas (server-sent events)"""
+        payload = self._deepseek_payload(prompt, model, temperature,
+                                         max_tokens, response_format,
+                                         system_prefix)
+        payload["stream"] = True
+        
+        async with self._get_http().stream(
+            "POST",
+            f"{DEEPSEEK_BASE_URL}/chat/completions",
+            json=payload,
+            headers={"Authorization": f"Bearer {self.api_key}"}
+        ) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    break
+                choices = json.loads(data).get("choices")
+                content = choices[0]["delta"].get("content") if choices else None
+                if content:
+                    yield content
+    
+    @staticmethod
+    def _deepseek_payload(prompt, model, temperature, max_tokens,
+                          response_format, system_prefix):
+        """Request body of a DeepSeek chat completion"""
+        payload = {
+            "model": model,
+            "messages": build(system_prefix, prompt),
+            "temperature": temperature,
+            "max_tokens": max_tokens
+        }
+        if response_format is not None:
+            # DeepSeek supports JSON mode but not json_schema
+            payload["response_format"] = {"type": "json_object"}
+        return payload
+
+
+def get_embeddings(texts: List[str], provider: str = "openai",
+                   batch_size: int = 256, client=None,
+                   model: str = "text-embedding-ada-002") -> np.ndarray:
+    """
+    Get dense embeddings for many texts
+    
+    The OpenAI embeddings endpoint takes up to 2048 inputs per request;
+    texts are sent in chunks of batch_size, one round trip per chunk
+    instead of one per text.
+    
+    Args:
+        texts: Input texts
+        provider: Embedding provider
+        batch_size: Inputs per request (max 2048)
+        client: OpenAI-compatible client exposing embeddings.create
+            (None = zero-vector placeholder)
+        model: Embedding model (paper uses text-embedding-ada-002)
+    
+    Returns:
+        float32 [len(texts), EMBEDDING_DIM]
+    """
+    if provider != "openai":
+        raise ValueError(f"Embeddings not supported for provider: {provider}")
+    
+    vectors = np.zeros((len(texts), EMBEDDING_DIM), dtype=np.float32)
+    if client is None:
+        # Placeholder - integrate with your embedding service
+        return vectors
+    
+    for start in range(0, len(texts), batch_size):
+        chunk = texts[start:start + batch_size]
+        data = client.embeddings.create(input=chunk, model=model).data
+        # Results carry their input index; do not rely on response order
+        data = sorted(data, key=lambda d: d.index)
+        vectors[start:start + len(chunk)] = [d.embedding for d in data]
+    return vectors
 
 
-def get_embedding(text: str, provider: str = "openai") -> list:
+def get_embedding(text: str, provider: str = "openai") -> np.ndarray:
     """
     Get dense embedding for text
     
@@ -102,7 +807,6 @@ def get_embedding(text: str, provider: str = "openai") -> list:
         provider: Embedding provider
     
     Returns:
-        Embedding vector (list of floats)
+        float32 [EMBEDDING_DIM] embedding vector
     """
-    # Placeholder - integrate with your embedding service
-    return [0.0] * 1536
+    return get_embeddings([text], provider)[0]
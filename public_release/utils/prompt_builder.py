@@ -0,0 +1,57 @@
+"""
+Prompt Prefix Builder
+
+Every PCC/PDS/state/response prompt repeats the same persona traits and
+rubric. Providers with prompt caching (OpenAI automatic prefix caching,
+DeepSeek context caching, Anthropic cache_control) skip the prefill of a
+prefix they have seen before, but only if it is byte-identical. Prompts
+are therefore split into a static prefix (role, L traits, rubric, output
+format) sent as the system message, and the per-call dynamic part
+(state, event, response) sent as the user message.
+
+Note: OpenAI and Anthropic only cache prefixes of at least 1024 tokens;
+the full rubrics (paper Appendices C-D) belong in the prefix for that.
+Never interpolate mutable data (S/M values, events) into a prefix.
+"""
+
+import sys
+from typing import Dict, List, Optional
+
+
+# Anthropic prompt-cache breakpoint placed after the static prefix
+CACHE_CONTROL = {"type": "ephemeral"}
+
+
+def static_prefix(text: str) -> str:
+    """
+    Canonical form of a static prompt prefix
+
+    Surrounding whitespace is stripped so prefixes built from indented
+    templates compare equal, and the result is interned: one frozen
+    string per distinct prefix (e.g. per persona).
+    """
+    return sys.intern(text.strip())
+
+
+def build(system_prefix: Optional[str], dynamic: str) -> List[Dict]:
+    """
+    Chat messages for an OpenAI-compatible API
+
+    Args:
+        system_prefix: Static prefix (None = single user message)
+        dynamic: Per-call part of the prompt
+
+    Returns:
+        [system message,] user message
+    """
+    messages = []
+    if system_prefix:
+        messages.append({"role": "system", "content": system_prefix})
+    messages.append({"role": "user", "content": dynamic})
+    return messages
+
+
+def anthropic_system(system_prefix: str) -> List[Dict]:
+    """Anthropic `system` blocks with a cache breakpoint on the prefix"""
+    return [{"type": "text", "text": system_prefix,
+             "cache_control": CACHE_CONTROL}]
@@ -0,0 +1,69 @@
+"""
+Async Token-Bucket Rate Limiter
+
+Provider limits are per minute, on requests (RPM) and on tokens (TPM).
+Bursting concurrent calls past them only earns 429s and retries, so
+LLMClient throttles itself: each call takes one request from the RPM
+bucket and its estimated token count from the TPM bucket before it is
+sent, and the estimate is corrected once the response reports usage.
+
+Note: Buckets start full, so a burst of up to one minute's budget is
+let through at once; after that calls are paced at the refill rate.
+"""
+
+import time
+import asyncio
+from typing import Optional
+
+
+class TokenBucket:
+    """
+    Token bucket refilled continuously at `rate` per `period` seconds
+
+    acquire() waits until the amount is available and takes it; waiters
+    are served in arrival order. adjust() credits or debits tokens after
+    the fact (the level may go negative, delaying later callers).
+    """
+
+    def __init__(self, rate: float, period: float = 60.0):
+        """
+        Args:
+            rate: Tokens per period (also the bucket capacity)
+            period: Refill period in seconds
+        """
+        self.capacity = float(rate)
+        self.fill_rate = rate / period
+        self._level = self.capacity
+        self._updated = time.monotonic()
+
+        # Created on first use: before Python 3.10 an asyncio.Lock binds
+        # to the loop current at construction, not the one awaiting it
+        self._lock: Optional[asyncio.Lock] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    async def acquire(self, amount: float = 1.0):
+        """Wait for and take `amount` tokens (capped at the capacity)"""
+        amount = min(amount, self.capacity)
+        loop = asyncio.get_running_loop()
+        # (Re)create the lock on first use and when used from a new loop
+        if self._loop is not loop:
+            self._lock = asyncio.Lock()
+            self._loop = loop
+        async with self._lock:
+            self._refill()
+            if self._level < amount:
+                await asyncio.sleep((amount - self._level) / self.fill_rate)
+                self._refill()
+            self._level -= amount
+
+    def adjust(self, amount: float):
+        """Credit (positive) or debit (negative) tokens"""
+        self._refill()
+        self._level = min(self.capacity, self._level + amount)
+
+    def _refill(self):
+        """Add the tokens accrued since the last update"""
+        now = time.monotonic()
+        self._level = min(self.capacity,
+                          self._level + (now - self._updated) * self.fill_rate)
+        self._updated = now
@@ -0,0 +1,490 @@
+"""
+Semantic LLM Response Cache
+
+Near-duplicate prompts (same rubric, paraphrased events/responses) are
+answered from earlier completions instead of the provider: a prompt hits
+when the cosine similarity of its embedding to a cached prompt's
+embedding reaches the threshold.
+
+Each entry learns its own threshold online (after vCache): when a
+prompt close to an entry misses and the provider is called anyway, the
+fresh completion tells whether serving the entry would have been correct.
+Two low-temperature completions rarely match byte for byte, so answers
+are judged on content (same_answer(): numeric verdicts within a
+tolerance, free-text evidence ignored). Near misses only label
+similarities below the threshold, so a fraction `explore_rate` of hits
+also goes to the provider and is judged the same way; without it a
+threshold could only fall, and wrong hits above it would never be seen.
+The entry's threshold becomes the lowest similarity at which its
+observed error rate stays within the error budget.
+
+With a cache_dir, entries (and their learned thresholds) are saved on
+close() and loaded by the next run with the same cache_key, so repeat
+experiments hit from their first event instead of starting cold.
+
+Note: Complements LLMCache (exact content-hash match). Only calls
+at or below `max_temperature` are cached, so sampling calls such as PDS
+rewrites always reach the provider.
+"""
+
+import os
+import json
+import random
+import hashlib
+import numpy as np
+from typing import Callable, Dict, List, Optional
+
+try:
+    import hnswlib
+except ImportError:  # ANN index is optional; lookups fall back to exact scan
+    hnswlib = None
+
+
+# float16 rows upcast to float32 at a time when scoring a lookup
+SIM_BLOCK_ROWS = 1024
+
+# HNSW parameters (graph degree, build and search beam widths)
+HNSW_M = 32
+EF_CONSTRUCTION = 200
+EF_SEARCH = 64
+
+# Max difference of numeric fields in agreeing JSON answers (PCC scores
+# 0-1, S/M deltas -2..2)
+ANSWER_TOLERANCE = 0.1
+
+# Snapshot files in a cache directory; the sidecar is written last
+EMBEDDINGS_FILE = 'embeddings.npy'
+SIDECAR_FILE = 'entries.json'
+
+
+def same_answer(cached: str, fresh: str,
+                tolerance: float = ANSWER_TOLERANCE) -> bool:
+    """
+    Default hit-correctness judge: whether two completions agree
+
+    JSON objects/arrays (PCC verdicts, impact assessments) agree when
+    they have the same structure and keys, numbers within `tolerance`
+    and equal booleans; free-text strings such as evidence are not
+    compared. Other completions must match up to whitespace.
+    """
+    a, b = _parse_json(cached), _parse_json(fresh)
+    if isinstance(a, (dict, list)) and isinstance(b, (dict, list)):
+        return _agree(a, b, tolerance)
+    return cached.split() == fresh.split()
+
+
+def _parse_json(text):
+    """Parsed JSON, or None if the text is not JSON"""
+    try:
+        return json.loads(text)
+    except (TypeError, ValueError):
+        return None
+
+
+def _agree(a, b, tolerance):
+    """Structural comparison of two parsed JSON values (see same_answer)"""
+    if isinstance(a, bool) or isinstance(b, bool):
+        return a == b
+    if isinstance(a, (int, float)) and isinstance(b, (int, float)):
+        return abs(a - b) <= tolerance
+    if isinstance(a, dict) and isinstance(b, dict):
+        return a.keys() == b.keys() and all(_agree(a[k], b[k], tolerance)
+                                            for k in a)
+    if isinstance(a, list) and isinstance(b, list):
+        return len(a) == len(b) and all(_agree(x, y, tolerance)
+                                        for x, y in zip(a, b))
+    if isinstance(a, str) and isinstance(b, str):
+        return True   # free text (evidence) is not compared
+    return a is None and b is None
+
+
+class SemanticCache:
+    """
+    Embedding-similarity completion cache (in memory, optionally
+    snapshotted to disk)
+
+    Entries are rows of a [capacity, d] matrix of unit-norm prompt
+    embeddings plus a parallel list of (prompt, response) pairs. The
+    matrix is float32 by default; dtype=np.float16 halves its memory
+    (cosine error ~1e-3) at the cost of slower exact scans, since rows
+    are upcast to float32 block by block for the mat-vec.
+
+    A lookup searches only the query's namespace (model + output
+    format), so a PCC prompt never hits a cached response-generation
+    prompt. Namespaces with at least ann_min_entries entries are
+    searched through their own HNSW index (inner product on unit-norm
+    rows = cosine) when hnswlib is installed, O(log N) instead of a
+    mat-vec over every row.
+
+    Entry = {embedding, response, threshold, hits, observations}; a
+    query is served by its nearest entry only if the similarity reaches
+    that entry's threshold. With probability explore_rate a hit is
+    instead reported as an exploration (see match()): the caller asks
+    the provider anyway and labels the entry, at a cost of about
+    explore_rate extra calls per served hit.
+
+    Snapshots live in cache_dir/<hash of cache_key>/: the embedding rows
+    (np.save), one HNSW index file per namespace and a JSON sidecar of
+    prompts, responses, namespaces and thresholds. Keying the directory
+    by (persona, model, rubric version) keeps prompts of another persona
+    or an outdated rubric out of the warm set.
+    """
+
+    def __init__(self, dim: int = 1536, threshold: float = 0.92,
+                 max_temperature: float = 0.3, capacity: int = 1024,
+                 error_budget: float = 0.02, min_threshold: float = 0.8,
+                 min_observations: int = 5, dtype=np.float32,
+                 ann_min_entries: int = 1024,
+                 cache_dir: Optional[str] = None, cache_key=None,
+                 judge: Optional[Callable[[str, str], bool]] = None,
+                 explore_rate: float = 0.05, seed: Optional[int] = None):
+        """
+        Initialize cache
+
+        Args:
+            dim: Prompt embedding dimension
+            threshold: Initial per-entry cosine similarity for a hit
+            max_temperature: Highest temperature whose calls are cached
+            capacity: Initial row capacity (doubles as needed)
+            error_budget: Max tolerated fraction of wrong hits per entry
+            min_threshold: Floor of learned thresholds; nearest entries
+                below it are not even observed
+            min_observations: Observations before an entry's threshold
+                is learned instead of the initial one
+            dtype: Embedding storage type (np.float32 or np.float16)
+            ann_min_entries: Namespace size from which lookups use the
+                HNSW index instead of the exact scan
+            cache_dir: Directory of snapshots across runs (None = memory
+                only); the matching snapshot is loaded here, and save()
+                or close() writes it
+            cache_key: Snapshot identity (JSON-serializable), e.g.
+                (persona, model, RUBRIC_VERSION); runs with another key
+                neither load nor overwrite this snapshot
+            judge: judge(cached, fresh) -> whether the cached response
+                would have been a correct answer (None = same_answer)
+            explore_rate: Fraction of hits re-checked against the
+                provider to label the entry (0 = never)
+            seed: Seed of the exploration sampler
+        """
+        self.dim = dim
+        self.threshold = threshold
+        self.max_temperature = max_temperature
+        self.error_budget = error_budget
+        self.min_threshold = min_threshold
+        self.min_observations = min_observations
+        self.ann_min_entries = ann_min_entries
+        self.judge = judge or same_answer
+        self.explore_rate = explore_rate
+        self._rng = random.Random(seed)
+
+        self._mat = np.empty((capacity, dim), dtype=dtype)
+        self._ns = np.empty(capacity, dtype=np.int32)
+        self._tau = np.empty(capacity, dtype=np.float32)   # per-entry threshold
+        self._hits = np.empty(capacity, dtype=np.int64)
+        self._entries: List[tuple] = []          # (prompt, response) per row
+        self._observations: List[list] = []      # [(sim, correct)] per row
+        self._namespaces: Dict[str, int] = {}     # namespace -> code
+        self._counts: Dict[int, int] = {}         # code -> number of entries
+        self._index = {}                          # code -> HNSW index
+
+        self.cache_key = cache_key
+        self.cache_dir = None
+        if cache_dir is not None:
+            digest = hashlib.blake2b(json.dumps(cache_key).encode('utf-8'),
+                                     digest_size=8).hexdigest()
+            self.cache_dir = os.path.join(cache_dir, digest)
+            self._load()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def cacheable(self, temperature: float) -> bool:
+        """Whether a call at this temperature is deterministic enough to cache"""
+        return temperature <= self.max_temperature
+
+    @staticmethod
+    def namespace(model: Optional[str], response_format: Optional[Dict],
+                  system_prefix: Optional[str] = None) -> str:
+        """
+        Namespace of a call: entries only match calls with the same one
+        
+        Only the per-call prompt is embedded, so the static system prefix
+        (persona traits, rubric) is part of the namespace instead.
+        """
+        prefix = None
+        if system_prefix:
+            prefix = hashlib.blake2b(system_prefix.encode('utf-8'),
+                                     digest_size=16).hexdigest()
+        return json.dumps([model, response_format, prefix], sort_keys=True)
+
+    def lookup(self, embedding, namespace: str = "") -> Optional[str]:
+        """
+        Return the cached response of the most similar prompt, or None
+
+        Args:
+            embedding: Prompt embedding (any norm)
+            namespace: Call namespace (see namespace())
+        """
+        row, sim = self.nearest(embedding, namespace)
+        if row is not None and sim >= self._tau[row]:
+            self._hits[row] += 1
+            return self._entries[row][1]
+        return None
+
+    def match(self, embedding, namespace: str = ""):
+        """
+        lookup() with exploration, for callers that label entries
+
+        Returns:
+            response: Cached response to serve, or None to call the provider
+            row, similarity: Nearest entry at or above min_threshold
+                (None, 0.0 if none); after the provider call, pass them
+                to observe() with agrees() as the label
+            explored: Whether this was a hit sent to the provider anyway
+                (the fresh completion should then not be added)
+        """
+        row, sim = self.nearest(embedding, namespace)
+        if row is None or sim < self._tau[row]:
+            return None, row, sim, False
+        if self.explore_rate > 0 and self._rng.random() < self.explore_rate:
+            return None, row, sim, True
+        self._hits[row] += 1
+        return self._entries[row][1], row, sim, False
+
+    def nearest(self, embedding, namespace: str = ""):
+        """
+        Nearest entry of the namespace at or above min_threshold
+
+        Returns:
+            (row, similarity), or (None, 0.0) if there is none
+        """
+        code = self._namespaces.get(namespace)
+        query = self._normalize(embedding)
+        if code is None or query is None:
+            return None, 0.0
+
+        if code in self._index and self._counts[code] >= self.ann_min_entries:
+            labels, distances = self._index[code].knn_query(query, k=1)
+            # hnswlib 'ip' distance is 1 - inner product
+            best, sim = int(labels[0, 0]), 1.0 - float(distances[0, 0])
+        else:
+            n = len(self._entries)
+            sims = self._similarities(query, n)
+            sims[self._ns[:n] != code] = -1.0
+            best = int(np.argmax(sims))
+            sim = float(sims[best])
+
+        if sim < self.min_threshold:
+            return None, 0.0
+        return best, sim
+
+    def response(self, row: int) -> str:
+        """Cached response of an entry"""
+        return self._entries[row][1]
+
+    def agrees(self, row: int, response: str) -> bool:
+        """Whether entry `row` would have answered a prompt whose fresh completion is `response`"""
+        return self.judge(self._entries[row][1], response)
+
+    def observe(self, row: int, similarity: float, correct: bool):
+        """
+        Record whether entry `row` would have been a correct answer for
+        a prompt at `similarity`, and re-estimate its threshold
+
+        Labels come for free on a near miss (agrees() judges the entry
+        against the provider's fresh completion) or from an offline
+        label loop.
+
+        The threshold is the lowest observed similarity s such that the
+        observations at or above s have an error rate within the budget;
+        errors at high similarity thus push it up, agreements at lower
+        similarity let it fall (never below min_threshold).
+        """
+        observations = self._observations[row]
+        observations.append((similarity, bool(correct)))
+        if len(observations) < self.min_observations:
+            return
+
+        tau = 1.0 + 1e-6   # nothing qualifies yet: serve no hits
+        errors = 0
+        for count, (sim, ok) in enumerate(sorted(observations, reverse=True), 1):
+            errors += not ok
+            if errors <= self.error_budget * count:
+                tau = sim
+        self._tau[row] = max(tau, self.min_threshold)
+
+    def add(self, embedding, prompt: str, response: str, namespace: str = ""):
+        """Cache a completion under its prompt embedding"""
+        self.add_many([embedding], [prompt], [response], namespace)
+
+    def add_many(self, embeddings, prompts: List[str], responses: List[str],
+                 namespace: str = ""):
+        """
+        Cache many completions of one namespace (e.g. a warm-up set)
+
+        Rows are written and indexed in one batch.
+        """
+        vecs = np.array(embeddings, dtype=np.float32, ndmin=2)
+        norms = np.linalg.norm(vecs, axis=1)
+        keep = np.flatnonzero(norms > 0)   # zero (placeholder) vectors are skipped
+        if len(keep) == 0:
+            return
+        vecs = vecs[keep] / norms[keep, None]
+
+        n = len(self._entries)
+        m = len(keep)
+        self._reserve(n + m)
+
+        code = self._namespaces.setdefault(namespace, len(self._namespaces))
+        self._mat[n:n + m] = vecs
+        self._ns[n:n + m] = code
+        self._tau[n:n + m] = self.threshold
+        self._hits[n:n + m] = 0
+        for i in keep:
+            self._entries.append((prompts[i], responses[i]))
+            self._observations.append([])
+        self._counts[code] = self._counts.get(code, 0) + m
+
+        if hnswlib is not None:
+            self._index_add(code, vecs, np.arange(n, n + m))
+
+    def save(self):
+        """
+        Write the snapshot to cache_dir (each file replaced atomically)
+
+        The sidecar goes last and records the row count, so a snapshot
+        torn between files is detected on load and ignored.
+        """
+        if self.cache_dir is None:
+            return
+        os.makedirs(self.cache_dir, exist_ok=True)
+        n = len(self._entries)
+
+        path = self._path(EMBEDDINGS_FILE)
+        with open(path + '.tmp', 'wb') as f:
+            np.save(f, self._mat[:n])
+        os.replace(path + '.tmp', path)
+
+        for code, index in self._index.items():
+            path = self._path(f'index_{code}.hnsw')
+            index.save_index(path + '.tmp')
+            os.replace(path + '.tmp', path)
+
+        sidecar = {
+            'key': self.cache_key,
+            'dim': self.dim,
+            'rows': n,
+            'namespaces': sorted(self._namespaces, key=self._namespaces.get),
+            'entries': self._entries,
+            'namespace': self._ns[:n].tolist(),
+            'threshold': self._tau[:n].tolist(),
+            'hits': self._hits[:n].tolist(),
+            'observations': self._observations,
+        }
+        path = self._path(SIDECAR_FILE)
+        with open(path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(sidecar, f, ensure_ascii=False)
+        os.replace(path + '.tmp', path)
+
+    def close(self):
+        """Save the snapshot (no-op without a cache_dir)"""
+        self.save()
+
+    def _load(self):
+        """Restore the snapshot in cache_dir, if present and consistent"""
+        sidecar_path = self._path(SIDECAR_FILE)
+        embeddings_path = self._path(EMBEDDINGS_FILE)
+        if not (os.path.exists(sidecar_path) and os.path.exists(embeddings_path)):
+            return
+        with open(sidecar_path, 'r', encoding='utf-8') as f:
+            sidecar = json.load(f)
+        vecs = np.load(embeddings_path)
+        n = sidecar['rows']
+        if sidecar['dim'] != self.dim or vecs.shape != (n, self.dim):
+            return   # torn or from another embedding model: start cold
+
+        self._reserve(n)
+        self._mat[:n] = vecs
+        self._ns[:n] = sidecar['namespace']
+        self._tau[:n] = sidecar['threshold']
+        self._hits[:n] = sidecar['hits']
+        self._entries = [tuple(entry) for entry in sidecar['entries']]
+        self._observations = [[tuple(o) for o in observations]
+                              for observations in sidecar['observations']]
+        self._namespaces = {name: code for code, name
+                            in enumerate(sidecar['namespaces'])}
+        codes, counts = np.unique(self._ns[:n], return_counts=True)
+        self._counts = dict(zip(codes.tolist(), counts.tolist()))
+
+        if hnswlib is not None:
+            for code in self._counts:
+                self._load_index(code)
+
+    def _load_index(self, code):
+        """Load a namespace's saved HNSW index, rebuilding it if missing or stale"""
+        rows = np.flatnonzero(self._ns[:len(self._entries)] == code)
+        path = self._path(f'index_{code}.hnsw')
+        if os.path.exists(path):
+            index = hnswlib.Index(space='ip', dim=self.dim)
+            index.load_index(path, max_elements=max(len(rows), 1024))
+            if index.get_current_count() == len(rows):
+                index.set_ef(EF_SEARCH)
+                self._index[code] = index
+                return
+        self._index_add(code, self._mat[rows].astype(np.float32), rows)
+
+    def _path(self, name):
+        """Path of a snapshot file"""
+        return os.path.join(self.cache_dir, name)
+
+    def _reserve(self, rows):
+        """Grow the row arrays (doubling) to hold at least `rows` entries"""
+        capacity = self._mat.shape[0]
+        if rows <= capacity:
+            return
+        while capacity < rows:
+            capacity *= 2
+        self._mat, self._ns, self._tau, self._hits = (
+            np.concatenate([a, np.empty((capacity - len(a),) + a.shape[1:],
+                                        dtype=a.dtype)])
+            for a in (self._mat, self._ns, self._tau, self._hits)
+        )
+
+    def _index_add(self, code, vecs, rows):
+        """Insert rows into the namespace's HNSW index"""
+        index = self._index.get(code)
+        if index is None:
+            index = hnswlib.Index(space='ip', dim=self.dim)
+            index.init_index(max_elements=max(len(rows), 1024),
+                             ef_construction=EF_CONSTRUCTION, M=HNSW_M)
+            index.set_ef(EF_SEARCH)
+            self._index[code] = index
+        elif index.get_current_count() + len(rows) > index.get_max_elements():
+            index.resize_index(max(index.get_current_count() + len(rows),
+                                   2 * index.get_max_elements()))
+        index.add_items(vecs, rows)
+
+    def _similarities(self, query, n):
+        """
+        Cosine similarity of the query to rows [:n]
+
+        NumPy has no BLAS path for float16, so half-precision rows are
+        upcast to float32 in blocks of SIM_BLOCK_ROWS for the mat-vec;
+        the temporary stays small however large the cache grows.
+        """
+        if self._mat.dtype == np.float32:
+            return self._mat[:n] @ query
+
+        sims = np.empty(n, dtype=np.float32)
+        for start in range(0, n, SIM_BLOCK_ROWS):
+            stop = min(n, start + SIM_BLOCK_ROWS)
+            sims[start:stop] = self._mat[start:stop].astype(np.float32) @ query
+        return sims
+
+    def _normalize(self, embedding):
+        """Unit-norm float32 copy, or None for a zero (placeholder) vector"""
+        vec = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vec)
+        if norm == 0.0:
+            return None
+        return vec / norm